@@ -0,0 +1,160 @@
+"""Замеры производительности симуляции.
+
+    python bench.py startup   — время импорта simulation против бюджета
+    python bench.py parallel  — тики/с большого мира: обычный, по регионам, в процессах;
+                                результат по регионам должен совпасть с World.tick
+    python bench.py trace     — тики/с без трассировки, с ней и после её выключения
+"""
+import argparse
+import compileall
+import hashlib
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import List
+
+# Бюджет на импорт simulation сверх голого запуска интерпретатора, мс
+STARTUP_BUDGET_MS = 60.0
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+STARTUP_SNIPPET = (
+    "import sys, simulation\n"
+    "assert 'arcade' not in sys.modules, 'simulation импортировал arcade'\n"
+)
+
+
+def run_python(code: str) -> float:
+    """Время (мс) запуска отдельного интерпретатора с кодом"""
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", code], check=True, cwd=ROOT)
+    return (time.perf_counter() - start) * 1000
+
+
+def bench_startup(args) -> int:
+    # Рабочие процессы запускаются с готовым байткодом, меряем так же
+    compileall.compile_file(os.path.join(ROOT, "simulation.py"), quiet=1)
+    baseline = statistics.median(run_python("pass") for _ in range(args.runs))
+    total = statistics.median(run_python(STARTUP_SNIPPET) for _ in range(args.runs))
+    cost = total - baseline
+    print(f"интерпретатор: {baseline:.1f} мс, с simulation: {total:.1f} мс")
+    print(f"импорт simulation: {cost:.1f} мс (бюджет {args.budget:.0f} мс)")
+    return 0 if cost <= args.budget else 1
+
+
+def stress_layout(rows: int, cols: int) -> List[str]:
+    """Раскладка для нагрузочных замеров: вертикальные линии шахта -> конвейеры -> рынок"""
+    column = ["M^"] + ["B^"] * (rows - 2) + ["O^"]
+    return ["".join(column[r] if c % 2 == 0 else ".." for c in range(cols)) for r in range(rows)]
+
+
+def world_digest(world) -> str:
+    """Отпечаток состояния мира для сравнения прогонов"""
+    h = hashlib.sha256()
+    economy = world.economy
+    h.update(repr((economy.balance, economy.total_production, economy.total_sales,
+                   sorted((k.value, v) for k, v in economy.sales_stats.items()))).encode())
+    for b in world.buildings():
+        state = {k: v for k, v in vars(b).items() if k not in ("target", "economy")}
+        h.update(repr(sorted(state.items(), key=lambda kv: kv[0])).encode())
+    return h.hexdigest()[:16]
+
+
+def bench_parallel(args) -> int:
+    from simulation import World, Economy
+    from parallel import PartitionedSimulation
+
+    layout = stress_layout(args.rows, args.cols)
+
+    world = World.from_layout(layout, economy=Economy(args.money))
+    count = sum(1 for _ in world.buildings())
+    start = time.perf_counter()
+    for _ in range(args.ticks):
+        world.tick(0.1)
+    elapsed = time.perf_counter() - start
+    expected = world_digest(world)
+    print(f"зданий: {count}, тиков: {args.ticks}")
+    print(f"World.tick:            {args.ticks / elapsed:8.1f} тиков/с  отпечаток {expected}")
+
+    failed = False
+    for label, parallel in (("регионы, эталон", False), ("регионы, процессы", True)):
+        world = World.from_layout(layout, economy=Economy(args.money))
+        with PartitionedSimulation(world, regions=args.regions, parallel=parallel) as sim:
+            start = time.perf_counter()
+            for _ in range(args.ticks):
+                sim.step(0.1)
+            # В процессах тики идут волной: считаем время до последнего
+            sim.sync()
+            elapsed = time.perf_counter() - start
+        digest = world_digest(world)
+        print(f"{label + ':':22} {args.ticks / elapsed:8.1f} тиков/с  отпечаток {digest}")
+        if digest != expected:
+            print(f"ОШИБКА: {label} расходится с World.tick")
+            failed = True
+        if world.economy.balance < 0:
+            print(f"ОШИБКА: {label} ушёл в минус ({world.economy.balance})")
+            failed = True
+    return 1 if failed else 0
+
+
+def bench_trace(args) -> int:
+    from simulation import World, BUILDING_REGISTRY
+    from tracing import ItemTracer
+
+    world = World.from_layout(stress_layout(args.rows, args.cols))
+    methods = {cls: cls.__dict__.get("accept_item") for cls in BUILDING_REGISTRY}
+
+    def rate() -> float:
+        start = time.perf_counter()
+        for _ in range(args.ticks):
+            world.tick(0.1)
+        return args.ticks / (time.perf_counter() - start)
+
+    # Сначала доводим конвейеры до установившейся загрузки
+    rate()
+    tracer = ItemTracer(world, every=args.every)
+    print(f"без трассировки:   {rate():8.1f} тиков/с")
+    tracer.enable()
+    print(f"с трассировкой:    {rate():8.1f} тиков/с (каждый {args.every}-й предмет)")
+    tracer.disable()
+    print(f"после выключения:  {rate():8.1f} тиков/с")
+    print(tracer.report())
+
+    if methods != {cls: cls.__dict__.get("accept_item") for cls in BUILDING_REGISTRY}:
+        print("ОШИБКА: после выключения остались обёртки accept_item")
+        return 1
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    startup = commands.add_parser("startup", help="время импорта simulation")
+    startup.add_argument("--runs", type=int, default=15)
+    startup.add_argument("--budget", type=float, default=STARTUP_BUDGET_MS)
+    startup.set_defaults(func=bench_startup)
+
+    parallel = commands.add_parser("parallel", help="тики большого мира по регионам")
+    parallel.add_argument("--rows", type=int, default=200)
+    parallel.add_argument("--cols", type=int, default=400)
+    parallel.add_argument("--ticks", type=int, default=100)
+    parallel.add_argument("--regions", type=int, default=os.cpu_count())
+    parallel.add_argument("--money", type=int, default=15000, help="стартовый баланс")
+    parallel.set_defaults(func=bench_parallel)
+
+    trace = commands.add_parser("trace", help="цена трассировки предметов")
+    trace.add_argument("--rows", type=int, default=200)
+    trace.add_argument("--cols", type=int, default=400)
+    trace.add_argument("--ticks", type=int, default=100)
+    trace.add_argument("--every", type=int, default=100)
+    trace.set_defaults(func=bench_trace)
+
+    args = parser.parse_args()
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
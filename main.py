@@ -1,469 +1,385 @@
+import argparse
+from typing import Dict, Optional, List, Tuple
+
 import arcade
-from typing import Optional, List, Tuple
-from dataclasses import dataclass
-from enum import Enum
+import PIL.Image
+import PIL.ImageDraw
+
+import remote
+from runner import SimulationThread
+from simulation import (
+    RESOURCES, economy, Direction, Conveyor,
+    BUILDING_REGISTRY, HOTKEYS,
+    World, Blueprint, line_path, rect_cells, CHUNK_SIZE,
+)
 
 SCREEN_WIDTH = 1008
 SCREEN_HEIGHT = 800
 SCREEN_TITLE = "Industrial Complex — Factory Management Simulator"
 
 GRID_SIZE = 48
-ROWS = (SCREEN_HEIGHT - 180) // GRID_SIZE
+PANEL_HEIGHT = 180
+ROWS = (SCREEN_HEIGHT - PANEL_HEIGHT) // GRID_SIZE
 COLS = SCREEN_WIDTH // GRID_SIZE
 
 
-class ResourceType(Enum):
-    ORE = "ore"
-    COAL = "coal"
-    IRON = "iron"
-    STEEL = "steel"
-    COPPER = "copper"
-    CIRCUIT = "circuit"
-    ENGINE = "engine"
-    ROBOT = "robot"
-    ELECTRONICS = "electronics"
-    CAR = "car"
-    COMPUTER = "computer"
-
-
-@dataclass
-class Resource:
-    name: str
-    value: int
-    color: Tuple[int, int, int]
-    icon: str
-
-
-RESOURCES = {
-    ResourceType.ORE: Resource("Руда", 50, (139, 69, 19), "●"),
-    ResourceType.COAL: Resource("Уголь", 30, (34, 34, 34), "◆"),
-    ResourceType.IRON: Resource("Железо", 100, (169, 169, 169), "■"),
-    ResourceType.STEEL: Resource("Сталь", 250, (192, 192, 192), "▲"),
-    ResourceType.COPPER: Resource("Медь", 150, (184, 115, 51), "★"),
-    ResourceType.CIRCUIT: Resource("Микросхема", 500, (0, 255, 127), "⊕"),
-    ResourceType.ENGINE: Resource("Двигатель", 800, (255, 69, 0), "◈"),
-    ResourceType.ROBOT: Resource("Робот", 1500, (0, 191, 255), "⚙"),
-    ResourceType.ELECTRONICS: Resource("Электроника", 1200, (147, 112, 219), "☢"),
-    ResourceType.CAR: Resource("Автомобиль", 5000, (220, 20, 60), "🚗"),
-    ResourceType.COMPUTER: Resource("Компьютер", 3000, (30, 144, 255), "💻"),
-}
-
-
 # =========================================================
-#                   ЭКОНОМИКА
+#                  ПОДСКАЗКА ПРИ НАВЕДЕНИИ
 # =========================================================
-class Economy:
-    def __init__(self, start_money=15000):
-        self.balance = start_money
-        self.daily_profit = 0
-        self.total_production = 0
-        self.total_sales = 0
-        self.production_stats = {resource_type: 0 for resource_type in ResourceType}
-        self.sales_stats = {resource_type: 0 for resource_type in ResourceType}
-
-    def spend(self, amount: int) -> bool:
-        if self.balance >= amount:
-            self.balance -= amount
-            return True
-        return False
-
-    def earn(self, amount: int, resource_type: ResourceType):
-        self.balance += amount
-        self.total_sales += amount
-        self.sales_stats[resource_type] += amount
-        self.daily_profit = self.total_sales - int(self.total_production * 0.7)
-
-    def track_production(self, resource_type: ResourceType, cost: int):
-        self.total_production += cost
-        self.production_stats[resource_type] += cost
-
-
-economy = Economy()
-
-class Direction(Enum):
-    UP = (1, 0)
-    DOWN = (-1, 0)
-    LEFT = (0, -1)
-    RIGHT = (0, 1)
+class HoverCache:
+    """Клетка под курсором и готовая раскладка подсказки.
+
+    Раскладка (тексты и размеры рамки) пересобирается только когда меняется
+    клетка или состояние здания в ней, а не на каждом кадре.
+    """
+
+    def __init__(self):
+        self.cell: Optional[Tuple[int, int]] = None
+        self.key = None
+        self.anchor: Optional[Tuple[int, int]] = None
+        self.batch = None
+        self.labels: List[arcade.Text] = []
+        self.width = 0
+        self.height = 0
+
+    @staticmethod
+    def state_key(building) -> tuple:
+        """Всё, от чего зависит текст подсказки"""
+        return building.kind, building.item
+
+    def invalidate(self):
+        self.key = None
+        self.anchor = None
+
+
 # =========================================================
-#                БАЗОВЫЙ КЛАСС МОДУЛЯ
+#                 АТЛАС ТЕКСТУР ЗДАНИЙ
 # =========================================================
-class Building:
-    cost = 0
-    upkeep = 0
-    cycle_time = 1.0
-    input_types = []
-    output_type = None
-    production_cost = 0
-
-    def __init__(self, row: int, col: int):
-        self.row = row
-        self.col = col
-        self.direction = Direction.RIGHT
-        self.item = None
-        self.timer = 0.0
-        self.progress = 0.0
-        self.efficiency = 1.0
-
-    def get_output_coords(self) -> Tuple[int, int]:
-        dr, dc = self.direction.value
-        return self.row + dr, self.col + dc
-
-    def get_input_coords(self) -> List[Tuple[int, int]]:
-        all_dirs = [Direction.UP, Direction.DOWN, Direction.LEFT, Direction.RIGHT]
-        return [(self.row + d.value[0], self.col + d.value[1])
-                for d in all_dirs if d != self.direction]
-
-    def can_accept(self, item_type: ResourceType, from_coords: Tuple[int, int]) -> bool:
-        # Конвейеры принимают всё, заводы — только нужное
-        if isinstance(self, Conveyor):
-            return self.item is None
-        is_input_side = from_coords in self.get_input_coords()
-        return self.item is None and item_type in self.input_types and is_input_side
-
-    def accept_item(self, item_type: ResourceType, from_coords: Tuple[int, int]) -> bool:
-        if self.can_accept(item_type, from_coords):
-            self.item = item_type
-            return True
-        return False
-
-    def do_cycle(self, delta_time: float) -> bool:
-        self.timer += delta_time
-        if self.timer >= self.cycle_time:
-            self.timer = 0.0
-            return True
-        return False
-
-    def charge_upkeep(self):
-        economy.spend(self.upkeep)
-
-    def process(self, grid, delta_time: float):
-        """Пытается передать предмет следующему зданию"""
-        if self.item is not None:
-            out_r, out_c = self.get_output_coords()
-            if 0 <= out_r < ROWS and 0 <= out_c < COLS:
-                target = grid[out_r][out_c]
-                if target and target.accept_item(self.item, (self.row, self.col)):
-                    self.item = None
+class BuildingAtlas:
+    """Готовые текстуры зданий: тип × направление × занятость.
+
+    Каждая комбинация рисуется один раз при запуске, после чего здание
+    на поле — это один спрайт с уже загруженной в атлас текстурой.
+    """
+
+    def __init__(self, free_color, busy_color):
+        self.textures = {}
+        self.flat_textures = {}
+        for building_type in BUILDING_REGISTRY.values():
+            for direction in Direction:
+                for busy in (False, True):
+                    image = self.render(building_type.color, direction, busy_color if busy else free_color)
+                    name = f"building-{building_type.name}-{direction.name}-{int(busy)}"
+                    self.textures[(building_type.cls, direction, busy)] = arcade.Texture(image, hash=name)
+
+    @staticmethod
+    def render(color, direction: Direction, indicator_color):
+        """Рисуем клетку здания: корпус, индикатор занятости и точку выхода"""
+        size = GRID_SIZE
+        center = size // 2
+        image = PIL.Image.new("RGBA", (size, size), tuple(color) + (255,))
+
+        # Полупрозрачные детали рисуем отдельным слоем и накладываем с альфой
+        overlay = PIL.Image.new("RGBA", (size, size), (0, 0, 0, 0))
+        draw = PIL.ImageDraw.Draw(overlay)
+        draw.rectangle((0, 0, size - 1, size - 1), outline=(255, 255, 255, 100), width=2)
+        draw.ellipse((center - 10, center - 10, center + 10, center + 10), fill=(0, 0, 0, 150))
+        image = PIL.Image.alpha_composite(image, overlay)
+
+        # Зеленый - свободно, Красный - занято
+        draw = PIL.ImageDraw.Draw(image)
+        draw.ellipse((center - 8, center - 8, center + 8, center + 8), fill=tuple(indicator_color) + (255,))
+
+        # Индикатор ВЫХОДА: жёлтая точка в сторону, куда здание смотрит
+        # (у картинки ось y направлена вниз, у поля — вверх)
+        dr, dc = direction.value
+        x = center + dc * (size // 2.5)
+        y = center - dr * (size // 2.5)
+        draw.ellipse((x - 5, y - 5, x + 5, y + 5), fill=tuple(arcade.color.YELLOW[:3]) + (255,))
+        return image
+
+    def get(self, kind: type, direction: Direction, busy: bool):
+        return self.textures[(kind, direction, busy)]
+
+    def flat(self, kind: type):
+        """Плоская плитка цвета здания для среднего уровня детализации"""
+        texture = self.flat_textures.get(kind)
+        if texture is None:
+            building_type = BUILDING_REGISTRY[kind]
+            image = PIL.Image.new("RGBA", (FLAT_TILE, FLAT_TILE), tuple(building_type.color) + (255,))
+            texture = arcade.Texture(image, hash=f"flat-{building_type.name}")
+            self.flat_textures[kind] = texture
+        return texture
 
 
 # =========================================================
-#                   ПРОМЫШЛЕННЫЕ МОДУЛИ
+#              КАРТА: ФРАГМЕНТЫ И УРОВНИ ДЕТАЛИЗАЦИИ
 # =========================================================
+# Ниже LOD_DETAIL_ZOOM здания рисуются плоскими плитками без индикаторов,
+# ниже LOD_FLAT_ZOOM — готовой картинкой фрагмента, пиксель на клетку
+LOD_DETAIL_ZOOM = 0.5
+LOD_FLAT_ZOOM = 0.125
+MIN_ZOOM = 0.02
+MAX_ZOOM = 2.0
+FLAT_TILE = 4
+
+# Сдвиг камеры стрелками, в экранных пикселях
+PAN_STEP = GRID_SIZE * 4
+PAN_KEYS = {
+    arcade.key.LEFT: (-PAN_STEP, 0),
+    arcade.key.RIGHT: (PAN_STEP, 0),
+    arcade.key.UP: (0, PAN_STEP),
+    arcade.key.DOWN: (0, -PAN_STEP),
+}
+
 
+class ChunkView:
+    """Графика одного фрагмента CHUNK_SIZE × CHUNK_SIZE клеток.
+
+    Каждый уровень детализации собирается только когда фрагмент впервые
+    показан на этом уровне после изменения, а не при каждом изменении.
+    """
+
+    def __init__(self, key: Tuple[int, int]):
+        self.key = key
+        self.version = -1
+        # Клетка, тип, направление и занятость каждого здания фрагмента
+        self.cells: List[list] = []
+        self.cells_version = -1
+        self.detail = arcade.SpriteList()
+        self.detail_version = -1
+        self.flat = arcade.SpriteList()
+        self.flat_version = -1
+        self.minimap: Optional[arcade.Sprite] = None
+
+
+class MapRenderer:
+    """Рисует поле любого размера с учётом масштаба камеры.
+
+    Графика хранится по фрагментам (CHUNK_SIZE × CHUNK_SIZE клеток) и
+    пересобирается только для фрагментов, чья версия в снимке выросла.
+    Каждый кадр обходятся лишь видимые фрагменты, поэтому стоимость кадра
+    зависит от размера экрана, а не от размера карты. При отдалении
+    детализация снижается: спрайты из атласа → плоские плитки → по одной
+    текстуре-миникарте на фрагмент.
+    """
+
+    def __init__(self, atlas: BuildingAtlas, even_color, odd_color):
+        self.atlas = atlas
+        self.even_color = tuple(even_color) + (255,)
+        self.odd_color = tuple(odd_color) + (255,)
+        self.chunks: Dict[Tuple[int, int], ChunkView] = {}
+        self.version = -1
+        self.size: Optional[Tuple[int, int]] = None
+
+        # Шахматный фон: по спрайту на фрагмент, пиксель текстуры = клетка
+        self.background = arcade.SpriteList()
+        self.checkers: Dict[Tuple[int, int], arcade.Texture] = {}
+        self.minimaps = arcade.SpriteList()
+        self.stale_minimaps = set()
 
+    # ---------------------------------------
+    # ПОДГОТОВКА
+    # ---------------------------------------
+    @staticmethod
+    def chunk_bounds(key: Tuple[int, int], rows: int, cols: int) -> Tuple[int, int, int, int]:
+        """Первая клетка фрагмента и его размер (у края карты он может быть меньше)"""
+        row0, col0 = key[0] * CHUNK_SIZE, key[1] * CHUNK_SIZE
+        return row0, col0, min(CHUNK_SIZE, rows - row0), min(CHUNK_SIZE, cols - col0)
+
+    @staticmethod
+    def chunk_sprite(texture, row0: int, col0: int, height: int, width: int) -> arcade.Sprite:
+        """Спрайт, растягивающий текстуру (пиксель на клетку) на фрагмент"""
+        return arcade.Sprite(texture, scale=GRID_SIZE,
+                             center_x=(col0 + width / 2) * GRID_SIZE,
+                             center_y=(row0 + height / 2) * GRID_SIZE)
+
+    def checker(self, height: int, width: int) -> arcade.Texture:
+        texture = self.checkers.get((height, width))
+        if texture is None:
+            image = PIL.Image.new("RGBA", (width, height))
+            # Начало фрагмента всегда на чётной клетке, поэтому узор общий;
+            # у картинки ось y направлена вниз, у поля — вверх
+            image.putdata([self.even_color if (height - 1 - y + x) % 2 == 0 else self.odd_color
+                           for y in range(height) for x in range(width)])
+            texture = arcade.Texture(image, hash=f"checker-{height}x{width}")
+            self.checkers[(height, width)] = texture
+        return texture
+
+    def resize(self, rows: int, cols: int):
+        self.background.clear()
+        for chunk_row in range((rows + CHUNK_SIZE - 1) // CHUNK_SIZE):
+            for chunk_col in range((cols + CHUNK_SIZE - 1) // CHUNK_SIZE):
+                row0, col0, height, width = self.chunk_bounds((chunk_row, chunk_col), rows, cols)
+                self.background.append(self.chunk_sprite(self.checker(height, width), row0, col0, height, width))
+        self.minimaps.clear()
+        self.stale_minimaps.clear()
+        self.chunks = {}
+        self.size = (rows, cols)
+
+    def update(self, snapshot):
+        """Отмечаем фрагменты, изменившиеся с прошлого кадра"""
+        if snapshot.version == self.version:
+            return
+        if self.size != (snapshot.rows, snapshot.cols):
+            self.resize(snapshot.rows, snapshot.cols)
+
+        chunks = self.chunks
+        for key, version in snapshot.chunk_versions.items():
+            view = chunks.get(key)
+            if view is None:
+                view = chunks[key] = ChunkView(key)
+            if version > view.version:
+                view.version = version
+                self.stale_minimaps.add(key)
+        self.version = snapshot.version
+
+    def scan(self, view: ChunkView, snapshot) -> List[list]:
+        """Здания фрагмента по снимку (один проход на версию фрагмента)"""
+        if view.cells_version != view.version:
+            row0, col0, height, width = self.chunk_bounds(view.key, snapshot.rows, snapshot.cols)
+            layout, index, items = snapshot.layout, snapshot.index, snapshot.items
+            cells = []
+            for row in range(row0, row0 + height):
+                for col in range(col0, col0 + width):
+                    i = index.get((row, col))
+                    if i is not None:
+                        kind, _, _, direction = layout[i]
+                        cells.append([(row, col), kind, direction, items[i] is not None])
+            view.cells = cells
+            view.cells_version = view.version
+        return view.cells
+
+    def build_detail(self, view: ChunkView, snapshot):
+        half = GRID_SIZE // 2
+        atlas = self.atlas
+        view.detail.clear()
+        for (row, col), kind, direction, busy in self.scan(view, snapshot):
+            view.detail.append(arcade.Sprite(atlas.get(kind, direction, busy),
+                                             center_x=col * GRID_SIZE + half, center_y=row * GRID_SIZE + half))
+        view.detail_version = view.version
+
+    def build_flat(self, view: ChunkView, snapshot):
+        half = GRID_SIZE // 2
+        atlas = self.atlas
+        view.flat.clear()
+        for (row, col), kind, _, _ in self.scan(view, snapshot):
+            view.flat.append(arcade.Sprite(atlas.flat(kind), scale=GRID_SIZE / FLAT_TILE,
+                                           center_x=col * GRID_SIZE + half, center_y=row * GRID_SIZE + half))
+        view.flat_version = view.version
+
+    def build_minimap(self, view: ChunkView, snapshot):
+        if view.minimap is not None:
+            # Старая текстура уйдёт из атласа вместе с последней ссылкой на неё
+            self.minimaps.remove(view.minimap)
+            view.minimap = None
+        cells = self.scan(view, snapshot)
+        if not cells:
+            return
 
+        row0, col0, height, width = self.chunk_bounds(view.key, snapshot.rows, snapshot.cols)
+        image = PIL.Image.new("RGBA", (width, height), (0, 0, 0, 0))
+        pixels = image.load()
+        for (row, col), kind, _, _ in cells:
+            pixels[col - col0, height - 1 - (row - row0)] = tuple(BUILDING_REGISTRY[kind].color) + (255,)
+        texture = arcade.Texture(image, hash=f"minimap-{view.key[0]}-{view.key[1]}-{view.version}")
+        view.minimap = self.chunk_sprite(texture, row0, col0, height, width)
+        self.minimaps.append(view.minimap)
 
-class Mine(Building):
-    cost = 300
-    upkeep = 5
-    cycle_time = 3.0
-    output_type = ResourceType.ORE
-
-    def process(self, grid, delta_time):
-        if self.do_cycle(delta_time):
-            self.charge_upkeep()
-            if self.item is None and economy.spend(20):
-                self.item = ResourceType.ORE
-                economy.track_production(ResourceType.ORE, 20)
-        super().process(grid, delta_time) # Выталкиваем руду
-
-
-class CoalMine(Building):
-    cost = 350
-    upkeep = 7
-    cycle_time = 2.5
-    output_type = ResourceType.COAL
-
-    def process(self, grid, delta_time: float):
-        if self.do_cycle(delta_time):
-            self.charge_upkeep()
-            if self.item is None and economy.spend(15):
-                self.item = ResourceType.COAL
-                economy.track_production(ResourceType.COAL, 15)
-        super().process(grid, delta_time)
-
-
-class Smelter(Building):
-    cost = 800
-    upkeep = 15
-    cycle_time = 4.0
-    input_types = [ResourceType.ORE, ResourceType.COAL]
-    output_type = ResourceType.IRON
-    production_cost = 50
-
-    def __init__(self, row: int, col: int):
-        super().__init__(row, col)
-        self.input_a = None
-        self.input_b = None
-        self.heat = 0.0
-        self.is_active = False
-
-    def can_accept(self, item_type: ResourceType, from_coords: Tuple[int, int]) -> bool:
-        is_input_side = from_coords in self.get_input_coords()
-        has_space = (self.input_a is None or self.input_b is None)
-        return is_input_side and has_space and item_type in self.input_types
-
-    def accept_item(self, item_type: ResourceType, from_coords: Tuple[int, int]) -> bool:
-        if self.can_accept(item_type, from_coords):
-            if self.input_a is None:
-                self.input_a = item_type
-            else:
-                self.input_b = item_type
-            return True
-        return False
-
-    def process(self, grid, delta_time: float):
-        if self.input_a and self.input_b and not self.is_active and self.item is None:
-            self.is_active = True
-            self.progress = 0.0
-
-        if self.is_active:
-            self.progress += delta_time
-            if self.progress >= self.cycle_time:
-                self.item = ResourceType.IRON
-                self.input_a = None
-                self.input_b = None
-                self.is_active = False
-                self.progress = 0.0
-                economy.track_production(ResourceType.IRON, self.production_cost)
-                self.charge_upkeep()
-
-        super().process(grid, delta_time)  # Выталкиваем металл
-
-
-class SteelMill(Building):
-    cost = 1200
-    upkeep = 25
-    cycle_time = 5.0
-    input_types = [ResourceType.IRON, ResourceType.COAL]
-    output_type = ResourceType.STEEL
-    production_cost = 100
-
-    def __init__(self, row: int, col: int):
-        super().__init__(row, col)
-        self.input_a = None
-        self.input_b = None
-
-    def can_accept(self, item_type: ResourceType, from_coords: Tuple[int, int]) -> bool:
-        is_input_side = from_coords in self.get_input_coords()
-        has_space = (self.input_a is None or self.input_b is None)
-        return is_input_side and has_space and item_type in self.input_types
-
-    def accept_item(self, item_type: ResourceType, from_coords: Tuple[int, int]) -> bool:
-        if self.can_accept(item_type, from_coords):
-            if self.input_a is None:
-                self.input_a = item_type
+    # ---------------------------------------
+    # КАДР
+    # ---------------------------------------
+    def visible_chunks(self, snapshot, left: float, right: float, bottom: float, top: float):
+        span = GRID_SIZE * CHUNK_SIZE
+        max_row = (snapshot.rows - 1) // CHUNK_SIZE
+        max_col = (snapshot.cols - 1) // CHUNK_SIZE
+        for chunk_row in range(max(0, int(bottom // span)), min(max_row, int(top // span)) + 1):
+            for chunk_col in range(max(0, int(left // span)), min(max_col, int(right // span)) + 1):
+                view = self.chunks.get((chunk_row, chunk_col))
+                if view is not None:
+                    yield view
+
+    def sync_busy(self, view: ChunkView, snapshot):
+        """Меняем текстуру только у зданий, чья занятость изменилась"""
+        atlas = self.atlas
+        index, items = snapshot.index, snapshot.items
+        for i, cell in enumerate(view.cells):
+            j = index.get(cell[0])
+            busy = j is not None and items[j] is not None
+            if busy != cell[3]:
+                cell[3] = busy
+                view.detail[i].texture = atlas.get(cell[1], cell[2], busy)
+
+    def draw(self, snapshot, zoom: float, left: float, right: float, bottom: float, top: float):
+        self.update(snapshot)
+        self.background.draw(pixelated=True)
+        if zoom < LOD_FLAT_ZOOM:
+            # Видна вся карта или большая её часть: одна текстура на фрагмент
+            for key in self.stale_minimaps:
+                self.build_minimap(self.chunks[key], snapshot)
+            self.stale_minimaps.clear()
+            self.minimaps.draw(pixelated=True)
+            return
+
+        for view in self.visible_chunks(snapshot, left, right, bottom, top):
+            if zoom >= LOD_DETAIL_ZOOM:
+                if view.detail_version != view.version:
+                    self.build_detail(view, snapshot)
+                else:
+                    self.sync_busy(view, snapshot)
+                view.detail.draw()
             else:
-                self.input_b = item_type
-            return True
-        return False
-
-    def process(self, grid, delta_time: float):
-        # Если есть ингредиенты и место для выхода — запускаем цикл
-        if self.input_a and self.input_b and self.item is None:
-            if self.do_cycle(delta_time):
-                self.charge_upkeep()
-                if economy.spend(self.production_cost):
-                    self.item = ResourceType.STEEL
-                    self.input_a = None
-                    self.input_b = None
-                    economy.track_production(ResourceType.STEEL, self.production_cost)
-
-        # ВАЖНО: передаем результат дальше
-        super().process(grid, delta_time)
-
-
-class AssemblyLine(Building):
-    cost = 2000
-    upkeep = 40
-    cycle_time = 6.0
-    input_types = [ResourceType.STEEL, ResourceType.ELECTRONICS]
-    output_type = ResourceType.CAR
-    production_cost = 500
-
-    def __init__(self, row: int, col: int):
-        super().__init__(row, col)
-        self.assembly_progress = 0.0
-        self.conveyor_position = 0.0
-
-    def process(self, grid, delta_time: float):
-        if self.do_cycle(delta_time) and self.item is None:
-            self.charge_upkeep()
-            if economy.spend(self.production_cost):
-                self.item = ResourceType.CAR
-                economy.track_production(ResourceType.CAR, self.production_cost)
-
-
-class ElectronicsFactory(Building):
-    cost = 1500
-    upkeep = 30
-    cycle_time = 4.0
-    input_types = [ResourceType.COPPER, ResourceType.CIRCUIT]
-    output_type = ResourceType.ELECTRONICS
-    production_cost = 300
-
-    def __init__(self, row: int, col: int):
-        super().__init__(row, col)
-
-    def process(self, grid, delta_time: float):
-        if self.do_cycle(delta_time) and self.item is None:
-            self.charge_upkeep()
-            if economy.spend(self.production_cost):
-                self.item = ResourceType.ELECTRONICS
-                economy.track_production(ResourceType.ELECTRONICS, self.production_cost)
-
-        # ВАЖНО: Этот вызов передает созданный предмет на конвейер или в маркет
-        super().process(grid, delta_time)
-
-class RobotFactory(Building):
-    cost = 3000
-    upkeep = 50
-    cycle_time = 8.0
-    input_types = [ResourceType.STEEL, ResourceType.ELECTRONICS, ResourceType.CIRCUIT]
-    output_type = ResourceType.ROBOT
-    production_cost = 800
-
-    def __init__(self, row: int, col: int):
-        super().__init__(row, col)
-        self.arm_rotation = 0.0
-        self.is_assembling = False
-
-    def process(self, grid, delta_time: float):
-        if self.do_cycle(delta_time) and self.item is None:
-            self.charge_upkeep()
-            if economy.spend(self.production_cost):
-                self.item = ResourceType.ROBOT
-                economy.track_production(ResourceType.ROBOT, self.production_cost)
-        if self.is_assembling and self.progress >= 1.0:
-            self.is_assembling = False
-
-
-class ComputerFactory(Building):
-    cost = 2500
-    upkeep = 45
-    cycle_time = 7.0
-    input_types = [ResourceType.ELECTRONICS, ResourceType.CIRCUIT]
-    output_type = ResourceType.COMPUTER
-    production_cost = 600
-
-    def __init__(self, row: int, col: int):
-        super().__init__(row, col)
-
-    def process(self, grid, delta_time: float):
-        if self.do_cycle(delta_time) and self.item is None:
-            self.charge_upkeep()
-            if economy.spend(self.production_cost):
-                self.item = ResourceType.COMPUTER
-                economy.track_production(ResourceType.COMPUTER, self.production_cost)
-
-        # ВАЖНО: Этот вызов передает созданный компьютер дальше
-        super().process(grid, delta_time)
-
-
-class Conveyor(Building):
-    cost = 100
-    upkeep = 1
-    cycle_time = 0.5
-
-    def process(self, grid, delta_time: float):
-        # Конвейеру достаточно просто вызывать базовый процесс передачи
-        super().process(grid, delta_time)
-
-class Warehouse(Building):
-    cost = 500
-    upkeep = 10
-    capacity = 10
-
-    def __init__(self, row: int, col: int):
-        super().__init__(row, col)
-        self.storage = []
-        self.stored_types = {rt: 0 for rt in ResourceType}
-
-    def can_accept(self, item_type: ResourceType, from_coords: Tuple[int, int]) -> bool:
-        # Проверяем, что предмет заходит с одной из 3 сторон входа
-        is_input_side = from_coords in self.get_input_coords()
-        return is_input_side and len(self.storage) < self.capacity
-
-    def accept_item(self, item_type: ResourceType, from_coords: Tuple[int, int]) -> bool:
-        if self.can_accept(item_type, from_coords):
-            self.storage.append(item_type)
-            self.stored_types[item_type] += 1
-            return True
-        return False
-
-    def can_give_item(self) -> bool:
-        return len(self.storage) > 0
-
-    def process(self, grid, delta_time: float):
-        if self.do_cycle(delta_time) and self.item is None and self.storage:
-            self.item = self.storage.pop(0)
-            self.stored_types[self.item] -= 1
-
-
-class Market(Building):
-    cost = 400
-    upkeep = 8
-    cycle_time = 2.0
-
-    def __init__(self, row: int, col: int):
-        super().__init__(row, col)
-        self.sell_prices = {
-            ResourceType.ORE: 80, ResourceType.COAL: 50,
-            ResourceType.IRON: 150, ResourceType.STEEL: 350,
-            ResourceType.COPPER: 200, ResourceType.CIRCUIT: 600,
-            ResourceType.ELECTRONICS: 1500, ResourceType.ENGINE: 1000,
-            ResourceType.ROBOT: 2000, ResourceType.CAR: 6000,
-            ResourceType.COMPUTER: 4000,
-        }
+                if view.flat_version != view.version:
+                    self.build_flat(view, snapshot)
+                view.flat.draw(pixelated=True)
+
 
-    # Исправляем сигнатуру: добавляем from_coords
-    def can_accept(self, item_type: ResourceType, from_coords: Tuple[int, int]) -> bool:
-        # Маркет принимает любой ресурс из списка цен, если в нем сейчас пусто
-        return self.item is None and item_type in self.sell_prices
-
-    # Также исправляем accept_item, чтобы соответствовать базе
-    def accept_item(self, item_type: ResourceType, from_coords: Tuple[int, int]) -> bool:
-        if self.can_accept(item_type, from_coords):
-            self.item = item_type
-            return True
-        return False
-
-    def process(self, grid, delta_time: float):
-        # Если в Маркете есть предмет — продаем его немедленно
-        if self.item:
-            price = self.sell_prices.get(self.item, 0)
-            economy.earn(price, self.item)
-            self.item = None # ОЧЕНЬ ВАЖНО: очищаем слот, чтобы Маркет мог принять следующий предмет
 # =========================================================
 #                     ИГРА
 # =========================================================
 class MyGame(arcade.Window):
-    def __init__(self):
+    def __init__(self, world: Optional[World] = None, server=None):
         super().__init__(SCREEN_WIDTH, SCREEN_HEIGHT, SCREEN_TITLE)
 
-        self.grid: List[List[Optional[Building]]] = [
-            [None for _ in range(COLS)] for _ in range(ROWS)
-        ]
+        # Миром владеет поток симуляции; UI читает его снимки (self.sim.snapshot)
+        # и отправляет изменения командами (self.sim.submit)
+        if world is None:
+            world = World(ROWS, COLS, economy=economy)
+        self.sim = SimulationThread(world, server=server)
         self.dir_names = {
             Direction.UP: "ВВЕРХ",
             Direction.DOWN: "ВНИЗ",
             Direction.LEFT: "ВЛЕВО",
             Direction.RIGHT: "ВПРАВО"
         }
-        self.simulation_running = False
         self.current_rotation = Direction.RIGHT  # Добавьте эту строку!
         self.build_mode = None
         self.selected_building = None
         self.show_stats = False
-        self.time_scale = 1.0
-        self.day_timer = 0.0
-        self.day_length = 60.0
 
         # Координаты мыши
         self.mouse_x: int = 0
         self.mouse_y: int = 0
 
+        # Камера поля: масштаб колесом, обзор стрелками и средней кнопкой.
+        # Клетка (0, 0) изначально стоит в левом нижнем углу над панелью UI
+        self.camera = arcade.camera.Camera2D()
+        self.camera.position = (SCREEN_WIDTH / 2, SCREEN_HEIGHT / 2 - PANEL_HEIGHT)
+
+        # Кэш подсказки для клетки под курсором
+        self.hover = HoverCache()
+
+        # Пакетная постройка: протягивание мышью и чертежи
+        self.drag_mode: Optional[str] = None  # 'line', 'rect', 'copy' или 'remove'
+        self.drag_start: Optional[Tuple[int, int]] = None
+        self.drag_end: Optional[Tuple[int, int]] = None
+        self.blueprint: Optional[Blueprint] = None
+        self.paste_mode = False
+
+        # Графика поля по фрагментам (создаётся вместе с ресурсами UI)
+        self.atlas: Optional[BuildingAtlas] = None
+        self.map: Optional[MapRenderer] = None
+
         # Палитра цветов для UI
         self.ui_colors = {
             'bg_dark': (40, 44, 52),
@@ -478,18 +394,17 @@ class MyGame(arcade.Window):
             'text_dim': (171, 178, 191),
         }
 
-        # Список доступных построек для панели
-        self.available_buildings = [
-            (1, "Шахта (руда)", Mine, 300),
-            (2, "Угольная шахта", CoalMine, 350),
-            (3, "Плавильня", Smelter, 800),
-            (4, "Сталелитейный завод", SteelMill, 1200),
-            (5, "Конвейер", Conveyor, 100),
-            (6, "Электронный завод", ElectronicsFactory, 1500),
-            (7, "Компьютерный завод", ComputerFactory, 2500),
-            (8, "Склад", Warehouse, 500),
-            ('M', "Рынок", Market, 400),
-        ]
+        # Список доступных построек для панели (в порядке реестра)
+        self.available_buildings = [t for t in BUILDING_REGISTRY.values() if t.hotkey is not None]
+
+        # Текстовые ресурсы (Batch, шрифты) создаются при первой отрисовке,
+        # чтобы создание окна не платило за загрузку шрифтов
+        self.text_batch = None
+
+    def create_ui_resources(self):
+        """Создаём текстовые объекты и текстуры UI (один раз, перед первым кадром)"""
+        self.atlas = BuildingAtlas(self.ui_colors['success'], self.ui_colors['danger'])
+        self.map = MapRenderer(self.atlas, self.ui_colors['bg_dark'], self.ui_colors['bg_medium'])
 
         # Инициализация Batch для оптимизации текста
         self.text_batch = arcade.pyglet.graphics.Batch()
@@ -527,13 +442,12 @@ class MyGame(arcade.Window):
         self.status_indicator_label = arcade.Text("", SCREEN_WIDTH // 2, SCREEN_HEIGHT - 90, (255, 255, 255), 14,
                                                   bold=True, anchor_x="center", batch=self.text_batch)
 
-
     # ---------------------------------------
     # РИСОВАНИЕ UI
     # ---------------------------------------
-    def draw_ui_panel(self):
+    def draw_ui_panel(self, snapshot):
         """Рисуем панель UI внизу экрана"""
-        panel_height = 180
+        panel_height = PANEL_HEIGHT
         panel_y = 0
 
         # Фон панели
@@ -548,19 +462,19 @@ class MyGame(arcade.Window):
         info_y = panel_y + panel_height - 40
 
         # Баланс
-        balance_color = self.ui_colors['success'] if economy.balance >= 0 else self.ui_colors['danger']
-        arcade.draw_text(f"💰 БАЛАНС: ${economy.balance:,}",
+        balance_color = self.ui_colors['success'] if snapshot.balance >= 0 else self.ui_colors['danger']
+        arcade.draw_text(f"💰 БАЛАНС: ${snapshot.balance:,}",
                          info_x, info_y, balance_color, 20, bold=True)
 
         # Дневная прибыль
-        profit_color = self.ui_colors['success'] if economy.daily_profit >= 0 else self.ui_colors['danger']
-        arcade.draw_text(f"📈 ДНЕВНАЯ ПРИБЫЛЬ: ${economy.daily_profit:+,}",
+        profit_color = self.ui_colors['success'] if snapshot.daily_profit >= 0 else self.ui_colors['danger']
+        arcade.draw_text(f"📈 ДНЕВНАЯ ПРИБЫЛЬ: ${snapshot.daily_profit:+,}",
                          info_x + 300, info_y, profit_color, 18)
 
         # Статистика производства
-        arcade.draw_text(f"⚙️ ПРОИЗВЕДЕНО: ${economy.total_production:,}",
+        arcade.draw_text(f"⚙️ ПРОИЗВЕДЕНО: ${snapshot.total_production:,}",
                          info_x, info_y - 30, self.ui_colors['text'], 16)
-        arcade.draw_text(f"📦 ПРОДАНО: ${economy.total_sales:,}",
+        arcade.draw_text(f"📦 ПРОДАНО: ${snapshot.total_sales:,}",
                          info_x + 300, info_y - 30, self.ui_colors['text'], 16)
 
         # Панель построек
@@ -569,7 +483,8 @@ class MyGame(arcade.Window):
         building_spacing = 70
         start_x = 20
 
-        for i, (hotkey, name, building_class, cost) in enumerate(self.available_buildings):
+        for i, building_type in enumerate(self.available_buildings):
+            hotkey = building_type.hotkey
             x = start_x + i * building_spacing
             if x + building_size > SCREEN_WIDTH - 100:
                 break
@@ -585,24 +500,46 @@ class MyGame(arcade.Window):
             # Иконка и текст
             arcade.draw_text(str(hotkey), x + building_size // 2 - 5, building_panel_y + 45,
                              self.ui_colors['text'], 14, bold=True)
-            arcade.draw_text(f"${cost}", x + building_size // 2 - 15, building_panel_y + 15,
+            arcade.draw_text(f"${building_type.cost}", x + building_size // 2 - 15, building_panel_y + 15,
                              self.ui_colors['warning'], 12)
 
 
 
-    def draw_tooltip(self, x: int, y: int, text: str):
-        """Рисуем всплывающую подсказку"""
-        lines = text.split('\n')
-        max_width = max(len(line) for line in lines) * 7
-        height = len(lines) * 20 + 10
+    def build_tooltip(self, building):
+        """Собираем раскладку подсказки для здания (только при изменении)"""
+        status = "ЗАНЯТО" if building.item else "СВОБОДНО"
+        item_name = RESOURCES[building.item].name if building.item else "Пусто"
+        lines = [
+            f"Объект: {building.kind.__name__}",
+            f"Статус: {status}",
+            f"Содержимое: {item_name}",
+        ]
+
+        hover = self.hover
+        hover.batch = arcade.pyglet.graphics.Batch()
+        hover.labels = [
+            arcade.Text(line, 0, 0, self.ui_colors['text'], 12, batch=hover.batch)
+            for line in lines
+        ]
+        hover.width = max(label.content_width for label in hover.labels) + 10
+        hover.height = len(lines) * 20 + 10
+        hover.anchor = None
+
+    def draw_tooltip(self, x: int, y: int):
+        """Рисуем всплывающую подсказку из готовой раскладки"""
+        hover = self.hover
+        if hover.anchor != (x, y):
+            # Курсор сдвинулся — переставляем строки, текст не пересобираем
+            for i, label in enumerate(hover.labels):
+                label.position = (x + 15, y + hover.height - 20 - i * 20)
+            hover.anchor = (x, y)
 
         # Фон подсказки
-        arcade.draw_lbwh_rectangle_filled(x + 10, y + 10, max_width, height, self.ui_colors['bg_dark'])
-        arcade.draw_lbwh_rectangle_outline(x + 10, y + 10, max_width, height, self.ui_colors['primary'], 1)
+        arcade.draw_lbwh_rectangle_filled(x + 10, y + 10, hover.width, hover.height, self.ui_colors['bg_dark'])
+        arcade.draw_lbwh_rectangle_outline(x + 10, y + 10, hover.width, hover.height, self.ui_colors['primary'], 1)
 
         # Текст подсказки
-        for i, line in enumerate(lines):
-            arcade.draw_text(line, x + 15, y + height - 20 - i * 20, self.ui_colors['text'], 12)
+        hover.batch.draw()
 
     def draw_building_info(self, building):
         """Рисуем информацию о выбранном здании"""
@@ -654,113 +591,80 @@ class MyGame(arcade.Window):
             arcade.draw_text(resource.name, legend_x + 20, y_offset - i * 20,
                              self.ui_colors['text_dim'], 12)
 
-    def draw_grid_background(self):
-        """Рисуем фон сетки с паттерном"""
-        for r in range(ROWS):
-            for c in range(COLS):
-                x = c * GRID_SIZE
-                y = r * GRID_SIZE
-
-                # Чередующийся фон для сетки
-                if (r + c) % 2 == 0:
-                    arcade.draw_lbwh_rectangle_filled(x, y, GRID_SIZE, GRID_SIZE, self.ui_colors['bg_dark'])
-                else:
-                    arcade.draw_lbwh_rectangle_filled(x, y, GRID_SIZE, GRID_SIZE, self.ui_colors['bg_medium'])
-
-                # Точки на пересечениях для красоты
-                arcade.draw_circle_filled(x, y, 1, self.ui_colors['text_dim'])
-
-    def draw_building(self, building, x: int, y: int):
-        """Рисует здание с круглым индикатором занятости без анимаций ресурсов"""
-        # 1. Определяем базовый цвет здания
-        if isinstance(building, Mine):
-            color = (139, 69, 19)
-        elif isinstance(building, CoalMine):
-            color = (34, 34, 34)
-        elif isinstance(building, Smelter):
-            color = (255, 140, 0)
-        elif isinstance(building, SteelMill):
-            color = (192, 192, 192)
-        elif isinstance(building, AssemblyLine):
-            color = (220, 20, 60)
-        elif isinstance(building, RobotFactory):
-            color = (0, 191, 255)
-        elif isinstance(building, Warehouse):
-            color = (160, 82, 45)
-        elif isinstance(building, Market):
-            color = (152, 195, 121)
-        elif isinstance(building, Conveyor):
-            color = (70, 70, 70)
-        else:
-            color = (100, 100, 100)
-
-        # 2. Рисуем корпус здания
-        arcade.draw_lbwh_rectangle_filled(x, y, GRID_SIZE, GRID_SIZE, color)
-        arcade.draw_lbwh_rectangle_outline(x, y, GRID_SIZE, GRID_SIZE, (255, 255, 255, 100), 2)
-
-        # 3. Рисуем КРУГ индикатора занятости в центре
-        # Зеленый - свободно, Красный - занято
-        indicator_color = self.ui_colors['danger'] if building.item else self.ui_colors['success']
-
-        center_x = x + GRID_SIZE // 2
-        center_y = y + GRID_SIZE // 2
-
-        # Рисуем подложку для круга (обводку)
-        arcade.draw_circle_filled(center_x, center_y, 10, (0, 0, 0, 150))
-        # Рисуем сам индикатор
-        arcade.draw_circle_filled(center_x, center_y, 8, indicator_color)
-
-        # Отрисовка индикатора ВЫХОДА
-        cx, cy = x + GRID_SIZE // 2, y + GRID_SIZE // 2
-        dr, dc = building.direction.value
-        # Смещаем желтую точку в сторону, куда здание смотрит (выход)
-        indicator_x = cx + dc * (GRID_SIZE // 2.5)
-        indicator_y = cy + dr * (GRID_SIZE // 2.5)
+    def draw_grid_lines(self, snapshot):
+        """Линии сетки только в видимой части поля (при крупном масштабе)"""
+        camera = self.camera
+        first_row = max(0, int(camera.bottom // GRID_SIZE))
+        last_row = min(snapshot.rows, int(camera.top // GRID_SIZE) + 1)
+        first_col = max(0, int(camera.left // GRID_SIZE))
+        last_col = min(snapshot.cols, int(camera.right // GRID_SIZE) + 1)
+        if first_row > last_row or first_col > last_col:
+            return
 
-        arcade.draw_circle_filled(indicator_x, indicator_y, 5, arcade.color.YELLOW)
+        color = self.ui_colors['bg_light']
+        points = []
+        for r in range(first_row, last_row + 1):
+            points += [(first_col * GRID_SIZE, r * GRID_SIZE), (last_col * GRID_SIZE, r * GRID_SIZE)]
+        for c in range(first_col, last_col + 1):
+            points += [(c * GRID_SIZE, first_row * GRID_SIZE), (c * GRID_SIZE, last_row * GRID_SIZE)]
+        arcade.draw_lines(points, color, 1)
+
+    def draw_drag_preview(self):
+        """Подсвечиваем клетки, которые затронет текущее протягивание"""
+        if self.drag_mode is None or self.drag_end is None:
+            return
+        color = self.ui_colors['danger'] if self.drag_mode == 'remove' else self.ui_colors['warning']
+        if self.drag_mode == 'line':
+            for r, c, _ in line_path(self.drag_start, self.drag_end, self.current_rotation):
+                arcade.draw_lbwh_rectangle_outline(c * GRID_SIZE, r * GRID_SIZE, GRID_SIZE, GRID_SIZE, color, 2)
+            return
 
+        # Прямоугольник может быть размером с карту — рисуем одну рамку
+        (r0, c0), (r1, c1) = self.drag_start, self.drag_end
+        arcade.draw_lbwh_rectangle_outline(min(c0, c1) * GRID_SIZE, min(r0, r1) * GRID_SIZE,
+                                           (abs(c1 - c0) + 1) * GRID_SIZE, (abs(r1 - r0) + 1) * GRID_SIZE,
+                                           color, 2)
 
     # ---------------------------------------
     # ОСНОВНОЕ РИСОВАНИЕ
     # ---------------------------------------
     def on_draw(self):
+        if self.text_batch is None:
+            self.create_ui_resources()
         self.clear()
 
-        # 1. Фон и сетка
+        # 1. Фон
         arcade.draw_lbwh_rectangle_filled(0, 0, SCREEN_WIDTH, SCREEN_HEIGHT, (25, 25, 35))
-        self.draw_grid_background()
 
-        # 2. Линии сетки (рисуем один раз)
-        for r in range(ROWS + 1):
-            arcade.draw_line(0, r * GRID_SIZE, SCREEN_WIDTH, r * GRID_SIZE, self.ui_colors['bg_light'], 1)
-        for c in range(COLS + 1):
-            arcade.draw_line(c * GRID_SIZE, 0, c * GRID_SIZE, ROWS * GRID_SIZE, self.ui_colors['bg_light'], 1)
+        # Один снимок на весь кадр: симуляция может опубликовать новый в любой момент
+        snapshot = self.sim.snapshot
 
-        # 3. Здания (только отрисовка, без логики текста!)
-        for r in range(ROWS):
-            for c in range(COLS):
-                cell = self.grid[r][c]
-                if cell:
-                    self.draw_building(cell, c * GRID_SIZE, r * GRID_SIZE)
+        # 2. Поле в координатах камеры: видимые фрагменты на уровне
+        # детализации, соответствующем масштабу
+        camera = self.camera
+        with camera.activate():
+            self.map.draw(snapshot, camera.zoom, camera.left, camera.right, camera.bottom, camera.top)
+            if camera.zoom >= LOD_DETAIL_ZOOM:
+                self.draw_grid_lines(snapshot)
+            self.draw_drag_preview()
 
         # 4. ВАЖНО: Подсказка при наведении (рисуется ОДИН РАЗ поверх всего)
-        mouse_grid_row = self.mouse_y // GRID_SIZE
-        mouse_grid_col = self.mouse_x // GRID_SIZE
-        if 0 <= mouse_grid_row < ROWS and 0 <= mouse_grid_col < COLS:
-            b = self.grid[mouse_grid_row][mouse_grid_col]
+        if self.hover.cell is not None:
+            b = snapshot.get(*self.hover.cell)
             if b:
-                status = "ЗАНЯТО" if b.item else "СВОБОДНО"
-                item_name = RESOURCES[b.item].name if b.item else "Пусто"
-                info_text = f"Объект: {b.__class__.__name__}\nСтатус: {status}\nСодержимое: {item_name}"
-                self.draw_tooltip(self.mouse_x, self.mouse_y, info_text)
+                key = HoverCache.state_key(b)
+                if key != self.hover.key:
+                    self.build_tooltip(b)
+                    self.hover.key = key
+                self.draw_tooltip(self.mouse_x, self.mouse_y)
 
         # 5. UI элементы
-        self.draw_ui_panel()
+        self.draw_ui_panel(snapshot)
         self.draw_resource_legend()
 
         # --- ИНДИКАТОР СИМУЛЯЦИИ ВВЕРХУ (ИСПРАВЛЕНО) ---
-        status_text = "СИМУЛЯЦИЯ: ЗАПУЩЕНА" if self.simulation_running else "СИМУЛЯЦИЯ: ПАУЗА"
-        status_color = self.ui_colors['success'] if self.simulation_running else self.ui_colors['danger']
+        status_text = "СИМУЛЯЦИЯ: ЗАПУЩЕНА" if snapshot.running else "СИМУЛЯЦИЯ: ПАУЗА"
+        status_color = self.ui_colors['success'] if snapshot.running else self.ui_colors['danger']
 
         box_width = 250
         box_height = 35
@@ -796,132 +700,138 @@ class MyGame(arcade.Window):
             "1-9,0,M - Выбор постройки",
             "TAB - Повернуть здание (выход)",  # Новая строка
             "ЛКМ - Построить | ПКМ - Удалить",
+            "Тянуть - линия | SHIFT - прямоугольник",
+            "CTRL+тянуть - копия | V - вставка",
+            "Колесо - масштаб | Стрелки, СКМ - обзор",
             "S - СТАРТ / ПАУЗА",
-            "R - Сброс | ESC - Отмена выбора"
+            "R - Сброс | ESC - Отмена выбора",
+            "CTRL+Z - отменить | CTRL+Y - вернуть",
         ]
 
         for i, text in enumerate(controls_text):
             arcade.draw_text(text, 20, SCREEN_HEIGHT - 80 - i * 20,
                              self.ui_colors['text_dim'], 12)
 
-    # ---------------------------------------
-    # ЛОГИКА
-    # ---------------------------------------
-    def on_update(self, delta_time: float):
-        if not self.simulation_running:
-            return
-
-        self.day_timer += delta_time * self.time_scale
-        if self.day_timer >= self.day_length:
-            self.day_timer = 0
-            economy.daily_profit = economy.total_sales - int(economy.total_production * 0.7)
-
-        # Передаем delta_time в каждое здание
-        for r in range(ROWS):
-            for c in range(COLS):
-                cell = self.grid[r][c]
-                if cell:
-                    cell.process(self.grid, delta_time)
-
     # ---------------------------------------
     # МЫШЬ
     # ---------------------------------------
+    def screen_to_cell(self, x: float, y: float) -> Optional[Tuple[int, int]]:
+        """Переводим экранные координаты в клетку сетки с учётом камеры"""
+        if y < PANEL_HEIGHT:
+            return None
+        world_x, world_y, _ = self.camera.unproject((x, y))
+        if world_x < 0 or world_y < 0:
+            return None
+
+        row = int(world_y // GRID_SIZE)
+        col = int(world_x // GRID_SIZE)
+        snapshot = self.sim.snapshot
+        if row < snapshot.rows and col < snapshot.cols:
+            return row, col
+        return None
+
     def on_mouse_motion(self, x: float, y: float, dx: float, dy: float):
         # Преобразуем координаты мыши в целые числа
         self.mouse_x = int(x)
         self.mouse_y = int(y)
 
-        # Выделение здания под мышью
-        grid_height = ROWS * GRID_SIZE
-        grid_width = COLS * GRID_SIZE
-
-        if 0 <= y < grid_height and 0 <= x < grid_width:
-            # Преобразуем координаты в индексы сетки
-            row = int(y // GRID_SIZE)
-            col = int(x // GRID_SIZE)
-
-            # Проверяем, что индексы в пределах допустимого
-            if 0 <= row < ROWS and 0 <= col < COLS:
-                self.selected_building = self.grid[row][col]
-            else:
-                self.selected_building = None
-        else:
-            self.selected_building = None
+        # Клетку под курсором ищем один раз на событие и кэшируем
+        cell = self.screen_to_cell(x, y)
+        if cell != self.hover.cell:
+            self.hover.cell = cell
+            self.hover.invalidate()
 
-    def on_mouse_press(self, x: float, y: float, button, modifiers):
-        # Преобразуем координаты в целые числа
-        x_int = int(x)
-        y_int = int(y)
-
-        grid_height = ROWS * GRID_SIZE
-        grid_width = COLS * GRID_SIZE
-        building_map = {
-            1: Mine, 2: CoalMine, 3: Smelter, 4: SteelMill,
-            5: Conveyor, 6: ElectronicsFactory,
-            7: ComputerFactory, 8: Warehouse,
-            'M': Market
-        }
-        if y_int >= grid_height or x_int >= grid_width:
+        # Выделение здания под мышью
+        self.selected_building = self.sim.snapshot.get(*cell) if cell else None
+
+    def on_mouse_drag(self, x: float, y: float, dx: float, dy: float, buttons, modifiers):
+        if buttons & arcade.MOUSE_BUTTON_MIDDLE:
+            self.pan(-dx, -dy)
+        self.on_mouse_motion(x, y, dx, dy)
+        if self.drag_mode is not None and self.hover.cell is not None:
+            self.drag_end = self.hover.cell
+
+    def on_mouse_scroll(self, x: int, y: int, scroll_x: float, scroll_y: float):
+        """Масштаб колесом; точка поля под курсором остаётся на месте"""
+        camera = self.camera
+        zoom = min(MAX_ZOOM, max(MIN_ZOOM, camera.zoom * 1.2 ** scroll_y))
+        if zoom == camera.zoom:
             return
+        before_x, before_y, _ = camera.unproject((x, y))
+        camera.zoom = zoom
+        after_x, after_y, _ = camera.unproject((x, y))
+        camera.position = (camera.position[0] + before_x - after_x, camera.position[1] + before_y - after_y)
+        self.on_mouse_motion(x, y, 0, 0)
 
-        # Преобразуем координаты в индексы сетки
-        row = int(y_int // GRID_SIZE)
-        col = int(x_int // GRID_SIZE)
+    def pan(self, dx: float, dy: float):
+        """Сдвигаем камеру на (dx, dy) экранных пикселей"""
+        camera = self.camera
+        camera.position = (camera.position[0] + dx / camera.zoom, camera.position[1] + dy / camera.zoom)
 
-        # Проверяем, что индексы в пределах допустимого
-        if row < 0 or row >= ROWS or col < 0 or col >= COLS:
+    def on_mouse_press(self, x: float, y: float, button, modifiers):
+        # Клетка под курсором (с учётом камеры)
+        cell = self.screen_to_cell(x, y)
+        if cell is None:
             return
-        if button == arcade.MOUSE_BUTTON_LEFT:
-            if self.grid[row][col] is not None: return
-
-            building_map = {
-                1: Mine, 2: CoalMine, 3: Smelter, 4: SteelMill,
-                5: Conveyor, 6: ElectronicsFactory,
-                7: ComputerFactory, 8: Warehouse,
-                'M': Market
-            }
 
-            build_class = building_map.get(self.build_mode)
-            if build_class:
-                if economy.spend(build_class.cost):
-                    new_b = build_class(row, col)
-                    new_b.direction = self.current_rotation  # Установка направления
-                    self.grid[row][col] = new_b
-
-
-        # ПКМ - удалить здание
+        # ПКМ - удалить здание (протягиванием — целый прямоугольник)
         if button == arcade.MOUSE_BUTTON_RIGHT:
-            cell = self.grid[row][col]
-            if cell:
-                refund = cell.cost // 2
-                economy.balance += refund
-                self.grid[row][col] = None
+            self.drag_mode = 'remove'
+        elif button != arcade.MOUSE_BUTTON_LEFT:
             return
-
-        # ЛКМ - построить
-        if self.grid[row][col]:
+        elif self.paste_mode and self.blueprint:
+            # Вставка чертежа: проверка стоимости и постройка одной транзакцией
+            self.sim.submit({"cmd": "place_many", "placements": self.blueprint.placements(*cell)})
+            return
+        elif modifiers & arcade.key.MOD_CTRL:
+            self.drag_mode = 'copy'
+        elif HOTKEYS.get(self.build_mode):
+            self.drag_mode = 'rect' if modifiers & arcade.key.MOD_SHIFT else 'line'
+        else:
             return
 
-        # Определяем класс для строительства
+        self.drag_start = cell
+        self.drag_end = cell
 
-        build_class = building_map.get(self.build_mode)
-        if not build_class:
+    def on_mouse_release(self, x: float, y: float, button, modifiers):
+        if self.drag_mode is None:
             return
+        mode, start, end = self.drag_mode, self.drag_start, self.drag_end
+        self.drag_mode = self.drag_start = self.drag_end = None
+
+        if mode == 'remove':
+            self.sim.submit({"cmd": "remove_many", "cells": rect_cells(start, end)})
+        elif mode == 'copy':
+            self.blueprint = Blueprint.capture(self.sim.snapshot, start, end)
+            self.paste_mode = bool(self.blueprint.cells)
+        else:
+            build_class = HOTKEYS[self.build_mode]
+            if mode == 'line':
+                placements = [(r, c, build_class, direction if build_class is Conveyor else self.current_rotation)
+                              for r, c, direction in line_path(start, end, self.current_rotation)]
+            else:
+                placements = [(r, c, build_class, self.current_rotation) for r, c in rect_cells(start, end)]
+            self.sim.submit({"cmd": "place_many", "placements": placements})
 
-        if economy.spend(build_class.cost):
-            self.grid[row][col] = build_class(row, col)
-
-        new_building = build_class(row, col)
-        new_building.direction = self.current_rotation
-        self.grid[row][col] = new_building
     # ---------------------------------------
     # КЛАВИАТУРА
     # ---------------------------------------
     def on_key_press(self, key, modifiers):
-        if key == arcade.key.S:
-            self.simulation_running = not self.simulation_running
+        if key == arcade.key.Z and modifiers & arcade.key.MOD_CTRL:
+            self.sim.submit({"cmd": "redo" if modifiers & arcade.key.MOD_SHIFT else "undo"})
+            return
+        elif key == arcade.key.Y and modifiers & arcade.key.MOD_CTRL:
+            self.sim.submit({"cmd": "redo"})
+            return
+        elif key == arcade.key.S:
+            self.sim.submit({"cmd": "toggle"})
         elif key == arcade.key.R:
-            self.grid = [[None for _ in range(COLS)] for _ in range(ROWS)]
+            self.sim.submit({"cmd": "clear"})
+        elif key == arcade.key.V and self.blueprint:
+            self.paste_mode = not self.paste_mode
+        elif key in PAN_KEYS:
+            self.pan(*PAN_KEYS[key])
+            self.on_mouse_motion(self.mouse_x, self.mouse_y, 0, 0)
 
         # Выбор построек
         if key == arcade.key.TAB:  # Вращение по нажатию Tab
@@ -952,9 +862,38 @@ class MyGame(arcade.Window):
             self.build_mode = 'M'
         elif key == arcade.key.ESCAPE:
             self.build_mode = None
+            self.paste_mode = False
 
 
 
 if __name__ == "__main__":
-    game = MyGame()
-    arcade.run()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description=SCREEN_TITLE)
+    parser.add_argument("--serve", action="store_true", help="включить сервер телеметрии и команд")
+    parser.add_argument("--host", default=remote.DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=remote.DEFAULT_PORT)
+    parser.add_argument("--socket", help="unix-сокет вместо TCP")
+    parser.add_argument("--rate", type=float, default=10.0, help="снимков телеметрии в секунду")
+    parser.add_argument("--layout", help="загрузить поле из файла раскладки (.txt или .jsonl)")
+    parser.add_argument("--rows", type=int, default=ROWS, help="рядов в пустом поле")
+    parser.add_argument("--cols", type=int, default=COLS, help="колонок в пустом поле")
+    args = parser.parse_args()
+
+    if args.layout:
+        world = World.from_layout(args.layout, economy=economy)
+    else:
+        world = World(args.rows, args.cols, economy=economy)
+
+    server = None
+    if args.serve:
+        server = remote.TelemetryServer(args.host, args.port, args.socket, args.rate)
+        try:
+            server.start()
+        except OSError as e:
+            parser.error(f"не удалось запустить сервер: {e}")
+
+    game = MyGame(world, server)
+    game.sim.start()
+    arcade.run()
+    game.sim.stop()
+    if server:
+        server.stop()
\ No newline at end of file
@@ -0,0 +1,346 @@
+"""Автоматический подбор раскладки фабрики под бюджет.
+
+Отжиг (simulated annealing) меняет раскладку по одной правке за шаг:
+ставит здание на пустую клетку или в клетку выхода соседа, сносит,
+поворачивает или заменяет здание. Стоимость раскладки не может превышать
+бюджет. Цель — прибыль в минуту.
+
+Оценка кандидата — быстрые прогоны World без окна. Здания влияют друг на
+друга только через выходы (предмет уходит в соседнюю клетку) и через
+энергосеть, поэтому раскладка распадается на независимые компоненты.
+Каждая компонента прогоняется отдельно, сдвинутой в начало координат, а
+результат запоминается по её содержимому: правка меняет одну-две
+компоненты, остальные берутся из кэша.
+
+Деньги у компонент общие: после постройки остаётся бюджет минус стоимость
+раскладки, и из него платятся upkeep и затраты на производство. Компонента
+прогоняется с неограниченным кредитом и запоминает, кроме прибыли, самую
+глубокую просадку баланса в каждом тике. Если в каждом тике сумма просадок
+компонент не больше остатка, ни одна трата в прогоне целиком не провалится
+и его прибыль в точности равна сумме по компонентам. Иначе кандидат
+прогоняется целиком с настоящим бюджетом (результат тоже кэшируется). Так
+цель всегда равна прибыли при настоящем бюджете, а не оценке сверху.
+
+    python optimizer.py --rows 8 --cols 12 --budget 15000 --iterations 3000 --out best.txt
+    python main.py --layout best.txt
+"""
+import argparse
+import math
+import random
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+from simulation import (
+    World, Economy, Direction, BUILDING_REGISTRY, STEP_DIRECTIONS,
+    LAYOUT_CODES, LAYOUT_CLASSES, DIRECTION_CODES,
+)
+
+Cell = Tuple[int, int]
+Layout = Dict[Cell, Tuple[type, Direction]]
+
+DIRECTIONS = list(Direction)
+
+# Кредит, с которым прогоняются компоненты: деньги не должны кончаться
+COMPONENT_CREDIT = 10 ** 12
+CACHE_LIMIT = 200_000
+# Прогонов раскладок целиком хранится меньше: они крупнее и реже повторяются
+VERIFY_CACHE_LIMIT = 20_000
+
+
+class _LowWaterEconomy(Economy):
+    """Экономика, которая помнит самый низкий баланс после траты"""
+
+    def __init__(self, start_money: int):
+        super().__init__(start_money)
+        self.low = start_money
+
+    def spend(self, amount: int) -> bool:
+        if super().spend(amount):
+            if self.balance < self.low:
+                self.low = self.balance
+            return True
+        return False
+
+
+def layout_cost(layout: Layout) -> int:
+    return sum(build_class.cost for build_class, _ in layout.values())
+
+
+def components(layout: Layout) -> List[List[Cell]]:
+    """Независимые части раскладки: связаны выходами и энергосетью"""
+    parent = {cell: cell for cell in layout}
+
+    def find(cell):
+        while parent[cell] != cell:
+            parent[cell] = parent[parent[cell]]
+            cell = parent[cell]
+        return cell
+
+    def union(a, b):
+        ra, rb = find(a), find(b)
+        if ra != rb:
+            parent[rb] = ra
+
+    for (row, col), (build_class, direction) in layout.items():
+        dr, dc = direction.value
+        if (row + dr, col + dc) in layout:
+            union((row, col), (row + dr, col + dc))
+        if build_class.conducts_power:
+            for dr, dc in STEP_DIRECTIONS:
+                neighbour = (row + dr, col + dc)
+                other = layout.get(neighbour)
+                if other is not None and (other[0].conducts_power or other[0].power_demand > 0):
+                    union((row, col), neighbour)
+
+    groups: Dict[Cell, List[Cell]] = {}
+    for cell in layout:
+        groups.setdefault(find(cell), []).append(cell)
+    return list(groups.values())
+
+
+def component_key(layout: Layout, cells: List[Cell]) -> str:
+    """Содержимое компоненты без привязки к месту на поле"""
+    top = min(row for row, _ in cells)
+    left = min(col for _, col in cells)
+    parts = []
+    for row, col in sorted(cells):
+        build_class, direction = layout[(row, col)]
+        parts.append(f"{row - top},{col - left}{LAYOUT_CODES[build_class]}{DIRECTION_CODES[direction]}")
+    return " ".join(parts)
+
+
+class LayoutOptimizer:
+    """Отжиг раскладки с кэшем оценок компонент"""
+
+    def __init__(self, rows: int, cols: int, budget: int, palette: List[type],
+                 seconds: float = 240.0, dt: float = 0.25, seed: Optional[int] = None):
+        self.rows = rows
+        self.cols = cols
+        self.budget = budget
+        self.palette = palette
+        self.seconds = seconds
+        self.dt = dt
+        self.ticks = max(1, int(round(seconds / dt)))
+        self.random = random.Random(seed)
+
+        # Компонента -> (прибыль в минуту, просадки баланса по тикам)
+        self.cache: Dict[str, Tuple[float, Tuple[int, ...]]] = {}
+        self.verified: Dict[frozenset, float] = {}
+        self.evaluations = 0
+        self.simulations = 0
+        self.cache_hits = 0
+        self.full_runs = 0
+
+    # ---------------------------------------
+    # ОЦЕНКА
+    # ---------------------------------------
+    def simulate(self, layout: Layout, cells: List[Cell]) -> Tuple[float, Tuple[int, ...]]:
+        """Прибыль компоненты (деньги в минуту) за прогон в отдельном мире и
+        самая глубокая просадка баланса в каждом тике"""
+        top = min(row for row, _ in cells)
+        left = min(col for _, col in cells)
+        height = max(row for row, _ in cells) - top + 1
+        width = max(col for _, col in cells) - left + 1
+
+        world = World(height, width, economy=_LowWaterEconomy(COMPONENT_CREDIT))
+        for row, col in cells:
+            build_class, direction = layout[(row, col)]
+            building = build_class(row - top, col - left)
+            building.direction = direction
+            building.economy = world.economy
+            world.grid[row - top][col - left] = building
+        world.relink_all()
+
+        economy = world.economy
+        drawdowns = []
+        for _ in range(self.ticks):
+            economy.low = economy.balance
+            world.tick(self.dt)
+            drawdowns.append(COMPONENT_CREDIT - economy.low)
+        self.simulations += 1
+        return (economy.balance - COMPONENT_CREDIT) * 60.0 / self.seconds, tuple(drawdowns)
+
+    def evaluate(self, layout: Layout) -> float:
+        """Прибыль в минуту при настоящем бюджете.
+
+        Сумма по компонентам (посчитанные берутся из кэша), если остатка
+        после постройки хватает на просадки в каждом тике; иначе — прогон
+        целиком.
+        Раскладку дороже бюджета построить нельзя, для неё возвращается
+        сумма по компонентам: она лишь ведёт поиск обратно в бюджет.
+        """
+        self.evaluations += 1
+        total = 0.0
+        drawdowns = []
+        cache = self.cache
+        for cells in components(layout):
+            key = component_key(layout, cells)
+            result = cache.get(key)
+            if result is None:
+                result = self.simulate(layout, cells)
+                if len(cache) >= CACHE_LIMIT:
+                    del cache[next(iter(cache))]
+                cache[key] = result
+            else:
+                self.cache_hits += 1
+            total += result[0]
+            drawdowns.append(result[1])
+
+        cost = layout_cost(layout)
+        if cost > self.budget:
+            return total
+        # Компоненты тратят из общего остатка: важна просадка в худшем тике
+        worst = max(map(sum, zip(*drawdowns))) if drawdowns else 0
+        if worst <= self.budget - cost:
+            return total
+        return self.verify(layout)
+
+    def verify(self, layout: Layout) -> float:
+        """Прогон всей раскладки целиком с настоящим бюджетом"""
+        key = frozenset(layout.items())
+        score = self.verified.get(key)
+        if score is not None:
+            return score
+
+        world = World(self.rows, self.cols, economy=Economy(self.budget))
+        world.place_many([(row, col, build_class, direction)
+                          for (row, col), (build_class, direction) in layout.items()])
+        start = world.economy.balance
+        for _ in range(self.ticks):
+            world.tick(self.dt)
+        self.full_runs += 1
+        score = (world.economy.balance - start) * 60.0 / self.seconds
+
+        if len(self.verified) >= VERIFY_CACHE_LIMIT:
+            del self.verified[next(iter(self.verified))]
+        self.verified[key] = score
+        return score
+
+    # ---------------------------------------
+    # ПОИСК
+    # ---------------------------------------
+    def mutate(self, layout: Layout) -> Optional[Layout]:
+        """Одна случайная правка; None — правка невозможна или не по бюджету"""
+        rnd = self.random
+        candidate = dict(layout)
+        move = rnd.random()
+        if not layout or move < 0.3:
+            cell = (rnd.randrange(self.rows), rnd.randrange(self.cols))
+            if cell in layout:
+                return None
+            candidate[cell] = (rnd.choice(self.palette), rnd.choice(DIRECTIONS))
+        elif move < 0.55:
+            # Продолжаем цепочку: новое здание в клетку выхода существующего
+            (row, col), (_, direction) = rnd.choice(list(layout.items()))
+            cell = (row + direction.value[0], col + direction.value[1])
+            if cell in layout or not (0 <= cell[0] < self.rows and 0 <= cell[1] < self.cols):
+                return None
+            candidate[cell] = (rnd.choice(self.palette), rnd.choice(DIRECTIONS))
+        elif move < 0.7:
+            del candidate[rnd.choice(list(layout))]
+        elif move < 0.85:
+            cell = rnd.choice(list(layout))
+            candidate[cell] = (layout[cell][0], rnd.choice(DIRECTIONS))
+        else:
+            cell = rnd.choice(list(layout))
+            candidate[cell] = (rnd.choice(self.palette), layout[cell][1])
+
+        if candidate == layout:
+            return None
+        # Раскладку дороже бюджета (например, начальную) можно только удешевлять
+        cost = layout_cost(candidate)
+        if cost > self.budget and cost >= layout_cost(layout):
+            return None
+        return candidate
+
+    def run(self, iterations: int, start: Optional[Layout] = None,
+            t_start: float = 50.0, t_end: float = 0.5, report_every: int = 0):
+        current = dict(start or {})
+        current_score = self.evaluate(current)
+        # Лучшей может стать только раскладка, которая укладывается в бюджет
+        best, best_score = {}, 0.0
+        if layout_cost(current) <= self.budget:
+            best, best_score = current, current_score
+        began = time.perf_counter()
+
+        for i in range(1, iterations + 1):
+            temperature = t_start * (t_end / t_start) ** (i / iterations)
+            candidate = self.mutate(current)
+            if candidate is not None:
+                score = self.evaluate(candidate)
+                delta = score - current_score
+                if delta >= 0 or self.random.random() < math.exp(delta / temperature):
+                    current, current_score = candidate, score
+                    if score > best_score and layout_cost(candidate) <= self.budget:
+                        best, best_score = candidate, score
+
+            if report_every and i % report_every == 0:
+                print(f"шаг {i}: лучшая {best_score:.0f}/мин, текущая {current_score:.0f}/мин, "
+                      f"{self.stats(time.perf_counter() - began)}")
+
+        self.elapsed = time.perf_counter() - began
+        return best, best_score
+
+    def stats(self, elapsed: float) -> str:
+        lookups = self.cache_hits + self.simulations
+        hit_rate = self.cache_hits / lookups if lookups else 0.0
+        return (f"{self.evaluations / elapsed:.0f} оценок/с, прогонов компонент {self.simulations}, "
+                f"попаданий в кэш {hit_rate:.0%}, прогонов целиком {self.full_runs}")
+
+
+def read_layout(path: str) -> Tuple[int, int, Layout]:
+    world = World.from_layout(path)
+    return world.rows, world.cols, {(b.row, b.col): (b.__class__, b.direction) for b in world.buildings()}
+
+
+def write_layout(path: str, rows: int, cols: int, layout: Layout):
+    world = World(rows, cols)
+    for (row, col), (build_class, direction) in layout.items():
+        building = build_class(row, col)
+        building.direction = direction
+        world.grid[row][col] = building
+    with open(path, "w", encoding="utf-8") as f:
+        world.to_layout(f)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=8)
+    parser.add_argument("--cols", type=int, default=12)
+    parser.add_argument("--budget", type=int, default=Economy().balance, help="стартовые деньги")
+    parser.add_argument("--iterations", type=int, default=3000)
+    parser.add_argument("--seconds", type=float, default=240.0, help="длительность оценочного прогона, с")
+    parser.add_argument("--dt", type=float, default=0.25, help="шаг тика прогона, с")
+    parser.add_argument("--palette", default="".join(LAYOUT_CODES[cls] for cls in BUILDING_REGISTRY),
+                        help="коды доступных зданий из раскладки (например OKSBM)")
+    parser.add_argument("--start", help="начальная раскладка вместо пустого поля")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--out", help="сохранить лучшую раскладку в файл")
+    parser.add_argument("--report-every", type=int, default=500)
+    args = parser.parse_args()
+
+    try:
+        palette = [LAYOUT_CLASSES[code] for code in args.palette]
+    except KeyError as e:
+        parser.error(f"неизвестный код здания {e.args[0]!r}")
+
+    rows, cols, start = args.rows, args.cols, None
+    if args.start:
+        rows, cols, start = read_layout(args.start)
+
+    optimizer = LayoutOptimizer(rows, cols, args.budget, palette, args.seconds, args.dt, args.seed)
+    best, _ = optimizer.run(args.iterations, start, report_every=args.report_every)
+
+    print(f"итог: {optimizer.stats(optimizer.elapsed)}, {args.iterations} шагов за {optimizer.elapsed:.1f} с")
+    # Итог — прогон целиком с настоящим бюджетом, а не сумма по компонентам
+    print(f"лучшая раскладка: {len(best)} зданий на ${layout_cost(best):,}, "
+          f"прибыль {optimizer.verify(best):.0f}/мин")
+    if args.out:
+        write_layout(args.out, rows, cols, best)
+        print(f"сохранено в {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,540 @@
+"""Симуляция одного большого мира на нескольких ядрах.
+
+Поле делится на горизонтальные полосы (регионы) не меньше двух рядов с
+примерно равным числом зданий, не разрезая энергосетей. Регион держит только свои ряды и тикает их
+в том же порядке, что World.tick, поэтому результат совпадает с обычным
+World.tick, а не только между запусками в процессах и в текущем.
+
+Граница. World.tick обходит ряды снизу вверх: предмет, ушедший вверх через
+границу, в том же тике обрабатывается регионом выше, а ушедший вниз
+попадает в уже обработанный ряд. Регион держит тени — копии клеток соседа,
+в которые смотрят выходы его крайних рядов. Выход через границу кладёт
+предмет в тень той же логикой accept_item, источник освобождается сразу,
+как в обычном тике, а принятые предметы уходят соседу и повторяются там
+на настоящих зданиях до начала его тика.
+
+Волна тиков. Региону k в тике t нужны регион k-1 после тика t (предметы
+снизу и его верхний ряд) и регион k+1 после двух нижних рядов тика t-1
+(предметы сверху и его нижний ряд, который дальше в тике уже не меняется).
+Поэтому регионы идут волной: пока k считает тик t, k-1 уже считает t+1.
+Сообщения ходят только между соседями, по каналам (Pipe): тени — полные
+состояния зданий, в общий массив чисел они не ложатся. Сообщения сверху
+вниз регион читает сразу, отдельным потоком, чтобы отправитель не ждал.
+
+Деньги. Все регионы тратят из одного баланса, и в World.tick успех траты
+зависит от порядка. Каждое здание делает не больше одного цикла за тик и
+тратит в нём не больше upkeep + production_cost. Если баланса за вычетом
+худшего случая для ещё не сведённых тиков хватает на худший случай тика,
+ни одна трата не проваливается ни здесь, ни в World.tick, и тик идёт
+волной. Иначе тик ждёт сведения предыдущих и идёт по регионам строго по
+очереди с точным балансом — как World.tick, и в минус деньги не уходят.
+
+Энергосети. Обеспеченность сети зависит от всех её станций и
+потребителей, а регион видит только свои ряды. Поэтому граница регионов
+никогда не проходит через энергосеть: сеть целиком лежит в одной полосе,
+и её PowerGrid в регионе совпадает с PowerGrid мира. Если разрезать
+поле, не задев сетей, нельзя, регионов получается меньше (вплоть до
+одного).
+
+Пока симуляция запущена, мир принадлежит ей: здания видны в исходном
+World только после collect(), экономика — по мере сведения тиков.
+"""
+import multiprocessing
+import queue
+import threading
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+from simulation import World, Economy, ResourceType, Building, PowerGrid
+
+ITEMS = list(ResourceType)
+
+Cell = Tuple[int, int]
+# Выход через границу: клетка источника и клетка, в которую он смотрит
+Link = Tuple[Cell, Cell]
+
+# Команды по цепочке регионов
+_TICK, _COLLECT, _STOP = 0, 1, 2
+
+# Сводка экономики тика: баланс, производство, продажи, по значению на
+# ресурс для production_stats и sales_stats, затем производство на момент
+# последней продажи и была ли продажа (по ним считается daily_profit)
+_TOTALS_WIDTH = 3 + 2 * len(ITEMS) + 2
+
+# Сколько тиков может быть в пути на регион
+_IN_FLIGHT_PER_REGION = 2
+
+
+@dataclass
+class _Upward:
+    """Сообщение региону выше: команда, параметры тика и граница снизу"""
+    command: int
+    delta_time: float = 0.0
+    # exact — тик идёт по очереди, balance — точный баланс перед регионом
+    exact: bool = False
+    balance: int = 0
+    totals: List[int] = field(default_factory=lambda: [0] * _TOTALS_WIDTH)
+    pushes: List[Tuple[int, ResourceType]] = field(default_factory=list)
+    ghosts: List[Building] = field(default_factory=list)
+
+
+@dataclass
+class _Downward:
+    """Сообщение региону ниже: граница сверху после двух нижних рядов"""
+    pushes: List[Tuple[int, ResourceType]] = field(default_factory=list)
+    ghosts: List[Building] = field(default_factory=list)
+
+
+def _ghost(building: Building) -> Building:
+    """Копия здания соседа без связей: в неё кладутся предметы через границу"""
+    twin = building.clone()
+    twin.target = None
+    twin.economy = None
+    return twin
+
+
+class _BorderPort:
+    """Цель выхода в чужом регионе: тень клетки соседа и журнал принятого"""
+
+    __slots__ = ("slot", "ghost", "log")
+
+    def __init__(self, slot: int, log: list):
+        self.slot = slot
+        self.ghost: Optional[Building] = None
+        self.log = log
+
+    def accept_item(self, item_type: ResourceType, from_coords: Cell) -> bool:
+        if self.ghost.accept_item(item_type, from_coords):
+            self.log.append((self.slot, item_type))
+            return True
+        return False
+
+
+class _RegionEconomy(Economy):
+    """Экономика региона за один тик; помнит производство на момент продажи"""
+
+    def __init__(self):
+        super().__init__(0)
+        self.production_at_sale: Optional[int] = None
+
+    def earn(self, amount: int, resource_type: ResourceType):
+        super().earn(amount, resource_type)
+        self.production_at_sale = self.total_production
+
+    def reset(self, balance: int):
+        self.balance = balance
+        self.total_production = 0
+        self.total_sales = 0
+        for stats in (self.production_stats, self.sales_stats):
+            for resource_type in stats:
+                stats[resource_type] = 0
+        self.production_at_sale = None
+
+
+class _Region:
+    """Ряды start..end-1 мира; одна и та же логика для процесса и для эталона.
+
+    В process() зданий регион подставляется вместо World: зданиям из мира
+    нужна только энергосеть.
+    """
+
+    def __init__(self, index: int, start: int, end: int, cols: int, buildings: List[Building],
+                 rising_out: List[Link], falling_out: List[Link],
+                 rising_in: List[Link], falling_in: List[Link]):
+        self.index = index
+        self.start = start
+        self.grid: List[List[Optional[Building]]] = [[None] * cols for _ in range(end - start)]
+        self.economy = _RegionEconomy()
+        for building in buildings:
+            building.economy = self.economy
+            self.grid[building.row - start][building.col] = building
+        for building in buildings:
+            row, col = building.get_output_coords()
+            if start <= row < end and 0 <= col < cols:
+                building.target = self.grid[row - start][col]
+
+        # Худший случай трат региона за тик: по циклу на здание
+        self.worst_spend = sum(b.upkeep + b.production_cost for b in buildings)
+
+        # Выходы верхнего ряда в регион выше и нижнего — в регион ниже
+        self.rising_log, self.falling_log = [], []
+        self.rising_ports = self._ports(rising_out, self.rising_log)
+        self.falling_ports = self._ports(falling_out, self.falling_log)
+        # Свои клетки, в которые смотрят выходы соседей: нижний ряд для
+        # региона ниже, верхний — для региона выше
+        self.rising_targets = [(self._cell(dst), src) for src, dst in rising_in]
+        self.falling_targets = [(self._cell(dst), src) for src, dst in falling_in]
+
+        self.power = PowerGrid(self)
+        self.power.rebuild()
+
+    def _cell(self, cell: Cell) -> Building:
+        row, col = cell
+        return self.grid[row - self.start][col]
+
+    def _ports(self, links: List[Link], log: list) -> List[_BorderPort]:
+        ports = []
+        for slot, (src, _) in enumerate(links):
+            port = _BorderPort(slot, log)
+            self._cell(src).target = port
+            ports.append(port)
+        return ports
+
+    def buildings(self):
+        for row in self.grid:
+            for building in row:
+                if building:
+                    yield building
+
+    # ---------------------------------------
+    # ТИК
+    # ---------------------------------------
+    @staticmethod
+    def _receive(targets, pushes):
+        """Повторяет на своих зданиях предметы, принятые тенями у соседа"""
+        for slot, item_type in pushes:
+            target, src = targets[slot]
+            if not target.accept_item(item_type, src):
+                raise RuntimeError(f"клетка ({target.row}, {target.col}) не приняла предмет, "
+                                   f"который приняла её тень")
+
+    @staticmethod
+    def _take(log: list) -> list:
+        items = list(log)
+        log.clear()
+        return items
+
+    def step(self, lower: _Upward, upper: _Downward, send_down) -> _Upward:
+        """Тик региона. lower — от региона ниже за этот тик, upper — от региона
+        выше за прошлый; send_down вызывается, когда нижний ряд готов"""
+        self._receive(self.falling_targets, upper.pushes)
+        for port, ghost in zip(self.rising_ports, upper.ghosts):
+            port.ghost = ghost
+        self._receive(self.rising_targets, lower.pushes)
+        for port, ghost in zip(self.falling_ports, lower.ghosts):
+            port.ghost = ghost
+
+        economy = self.economy
+        start_balance = lower.balance if lower.exact else self.worst_spend
+        economy.reset(start_balance)
+        self.power.balance()
+
+        delta_time = lower.delta_time
+        for index, row in enumerate(self.grid):
+            for building in row:
+                if building:
+                    building.process(self, delta_time)
+            if index == 1 and send_down is not None:
+                # Нижний ряд в этом тике больше не изменится
+                send_down(_Downward(self._take(self.falling_log),
+                                    [_ghost(target) for target, _ in self.rising_targets]))
+
+        totals = list(lower.totals)
+        production_before = totals[1]
+        totals[0] += economy.balance - start_balance
+        totals[1] += economy.total_production
+        totals[2] += economy.total_sales
+        n = len(ITEMS)
+        for i, item in enumerate(ITEMS):
+            totals[3 + i] += economy.production_stats[item]
+            totals[3 + n + i] += economy.sales_stats[item]
+        if economy.production_at_sale is not None:
+            totals[-2] = production_before + economy.production_at_sale
+            totals[-1] = 1
+
+        return _Upward(_TICK, delta_time, lower.exact, economy.balance if lower.exact else 0, totals,
+                       self._take(self.rising_log),
+                       [_ghost(target) for target, _ in self.falling_targets])
+
+    def collect(self, upper: Optional[_Downward]) -> List[Building]:
+        """Принимает последние предметы сверху и отдаёт здания"""
+        if upper is not None:
+            self._receive(self.falling_targets, upper.pushes)
+        result = list(self.buildings())
+        for building in result:
+            building.target = None
+            building.economy = None
+        return result
+
+
+def _pump(connection, inbox: queue.SimpleQueue):
+    """Читает канал, пока он открыт, и складывает сообщения в очередь"""
+    try:
+        while True:
+            inbox.put(connection.recv())
+    except (EOFError, OSError):
+        pass
+
+
+def _worker(region_args, initial: Optional[_Downward], from_lower, to_upper, from_upper, to_lower, results):
+    region = _Region(*region_args)
+    if from_upper is not None:
+        # Регион выше шлёт вниз посреди своего тика, а нужны эти сообщения
+        # только в начале следующего тика этого региона. Тени широкого поля
+        # не влезают в буфер канала: без чтения сразу отправитель встал бы
+        # в send(), и на последнем тике в пути волна не доходит до верха
+        inbox = queue.SimpleQueue()
+        threading.Thread(target=_pump, args=(from_upper, inbox), daemon=True).start()
+        from_upper = inbox
+    upper = initial
+    ticks = 0
+    while True:
+        message = from_lower.recv()
+        if message.command == _TICK:
+            if ticks and from_upper is not None:
+                upper = from_upper.get()
+            to_upper.send(region.step(message, upper, to_lower.send if to_lower is not None else None))
+            ticks += 1
+            continue
+
+        # Команда идёт вверх по цепочке и возвращается к симуляции от верхнего
+        to_upper.send(message)
+        if message.command == _COLLECT:
+            if ticks and from_upper is not None:
+                upper = from_upper.get()
+            results.send(region.collect(upper))
+        return
+
+
+def _power_crosses(world: World, row: int) -> bool:
+    """Проходит ли энергосеть между рядами row - 1 и row"""
+    is_node = PowerGrid.is_node
+    for below, above in zip(world.grid[row - 1], world.grid[row]):
+        if is_node(below) and is_node(above) and (below.conducts_power or above.conducts_power):
+            return True
+    return False
+
+
+def split_rows(world: World, regions: int) -> List[Tuple[int, int]]:
+    """Делит ряды на полосы не меньше двух рядов с примерно равным числом зданий.
+
+    Граница не проходит через энергосеть: берётся ближайший к идеальному
+    разрез, который её не режет. Если таких нет, полос получается меньше.
+    """
+    counts = [sum(1 for b in row if b) for row in world.grid]
+    prefix = [0]
+    for count in counts:
+        prefix.append(prefix[-1] + count)
+    total = prefix[-1]
+    cuts = [row for row in range(2, world.rows - 1) if not _power_crosses(world, row)]
+
+    bounds = []
+    start = 0
+    for part in range(1, regions):
+        ideal = next(row for row in range(world.rows + 1) if prefix[row] * regions >= total * part)
+        allowed = [row for row in cuts if row >= start + 2]
+        if not allowed:
+            break
+        cut = min(allowed, key=lambda row: (abs(row - ideal), row))
+        bounds.append((start, cut))
+        start = cut
+    bounds.append((start, world.rows))
+    return bounds
+
+
+class PartitionedSimulation:
+    """Тикает мир по регионам, в отдельных процессах или (эталон) в текущем.
+
+        with PartitionedSimulation(world, regions=4) as sim:
+            for _ in range(1000):
+                sim.step(0.1)
+        # после выхода world снова содержит актуальные здания
+
+    В процессах step() не ждёт конца тика: тики идут волной, экономика
+    мира сводится по мере их завершения; sync() и collect() дожидаются всех.
+    """
+
+    def __init__(self, world: World, regions: int = None, parallel: bool = True):
+        self.world = world
+        self.parallel = parallel
+        # Здания уходят в регионы и меняются там: с форками их делить нельзя
+        world.materialize()
+        bands = split_rows(world, regions or multiprocessing.cpu_count())
+        region_of_row = {}
+        for index, (start, end) in enumerate(bands):
+            for row in range(start, end):
+                region_of_row[row] = index
+
+        # Выходы через границу k | k+1: вверх (rising) и вниз (falling),
+        # в порядке обхода источников
+        rising = [[] for _ in bands]
+        falling = [[] for _ in bands]
+        for building in world.buildings():
+            target = building.target
+            if target is None:
+                continue
+            source_region = region_of_row[building.row]
+            target_region = region_of_row[target.row]
+            link = ((building.row, building.col), (target.row, target.col))
+            if target_region == source_region + 1:
+                rising[source_region].append(link)
+            elif target_region == source_region - 1:
+                falling[target_region].append(link)
+
+        # Тени нижнего ряда региона выше на первый тик
+        initial = [_Downward([], [_ghost(world.grid[r][c]) for _, (r, c) in rising[index]])
+                   for index in range(len(bands))]
+
+        region_buildings = [[] for _ in bands]
+        for building in world.buildings():
+            region_buildings[region_of_row[building.row]].append(building)
+            building.target = None
+            building.economy = None
+        last = len(bands) - 1
+        region_args = [(index, start, end, world.cols, region_buildings[index],
+                        rising[index] if index < last else [],
+                        falling[index - 1] if index > 0 else [],
+                        rising[index - 1] if index > 0 else [],
+                        falling[index] if index < last else [])
+                       for index, (start, end) in enumerate(bands)]
+
+        self.worst_spend = sum(b.upkeep + b.production_cost for part in region_buildings for b in part)
+        self.in_flight = 0
+        self.max_in_flight = _IN_FLIGHT_PER_REGION * len(bands)
+
+        self.regions: List[_Region] = []
+        self.processes = []
+        self.results = []
+        if parallel:
+            # Цепочка: симуляция -> регион 0 -> ... -> верхний -> симуляция,
+            # и обратные каналы от каждого региона к нижнему соседу
+            head_recv, self.head = multiprocessing.Pipe(duplex=False)
+            from_lower = head_recv
+            down = [multiprocessing.Pipe(duplex=False) for _ in range(last)]
+            for index, args in enumerate(region_args):
+                if index < last:
+                    up_recv, to_upper = multiprocessing.Pipe(duplex=False)
+                else:
+                    self.tail, to_upper = multiprocessing.Pipe(duplex=False)
+                    up_recv = None
+                result_recv, result_send = multiprocessing.Pipe(duplex=False)
+                process = multiprocessing.Process(
+                    target=_worker,
+                    args=(args, initial[index], from_lower, to_upper,
+                          down[index][0] if index < last else None,
+                          down[index - 1][1] if index > 0 else None,
+                          result_send),
+                    daemon=True)
+                process.start()
+                self.processes.append(process)
+                self.results.append(result_recv)
+                from_lower = up_recv
+        else:
+            self.regions = [_Region(*args) for args in region_args]
+            # Сообщение каждому региону от региона выше на следующий тик
+            self.from_above: List[Optional[_Downward]] = initial
+
+    # ---------------------------------------
+    # ТИКИ
+    # ---------------------------------------
+    def step(self, delta_time: float):
+        exact = not self._reserve()
+        message = _Upward(_TICK, delta_time, exact, self.world.economy.balance if exact else 0)
+        self.in_flight += 1
+        if self.parallel:
+            self.head.send(message)
+            return
+
+        from_above = self.from_above
+        for index, region in enumerate(self.regions):
+            def send_down(reply, below=index - 1):
+                from_above[below] = reply
+            message = region.step(message, from_above[index], send_down if index else None)
+        self._merge(message)
+
+    def sync(self):
+        """Дожидается конца всех отправленных тиков и сводит их в мир"""
+        while self.in_flight:
+            self._drain(block=True)
+
+    def _reserve(self) -> bool:
+        """True — тик можно пустить волной: ни одна трата в нём не провалится.
+        False — тиков в пути нет, тик пойдёт по очереди с точным балансом"""
+        worst = self.worst_spend
+        while True:
+            self._drain(block=False)
+            # Каждый тик в пути может потратить не больше worst
+            balance = self.world.economy.balance - worst * self.in_flight
+            if self.in_flight < self.max_in_flight and balance >= worst:
+                return True
+            if not self.in_flight:
+                return False
+            self._drain(block=True)
+
+    def _drain(self, block: bool):
+        """Сводит завершённые тики; block — дождаться хотя бы одного"""
+        if not self.parallel:
+            return
+        while self.in_flight and (block or self.tail.poll()):
+            self._merge(self.tail.recv())
+            block = False
+
+    def _merge(self, message: _Upward):
+        economy = self.world.economy
+        totals = message.totals
+        production_before = economy.total_production
+        economy.balance += totals[0]
+        economy.total_production += totals[1]
+        economy.total_sales += totals[2]
+        n = len(ITEMS)
+        for i, item in enumerate(ITEMS):
+            economy.production_stats[item] += totals[3 + i]
+            economy.sales_stats[item] += totals[3 + n + i]
+        if totals[-1]:
+            economy.daily_profit = economy.total_sales - int((production_before + totals[-2]) * 0.7)
+        self.world.ticks += 1
+        self.world.time += message.delta_time
+        self.in_flight -= 1
+
+    # ---------------------------------------
+    # ЗАВЕРШЕНИЕ
+    # ---------------------------------------
+    def _finish(self, command: int):
+        """Пускает команду по цепочке и сводит все тики, ушедшие до неё"""
+        self.head.send(_Upward(command))
+        while True:
+            message = self.tail.recv()
+            if message.command == command:
+                break
+            self._merge(message)
+
+    def collect(self) -> World:
+        """Возвращает здания в исходный мир и завершает рабочие процессы"""
+        if self.parallel:
+            self._finish(_COLLECT)
+            parts = [conn.recv() for conn in self.results]
+            for process in self.processes:
+                process.join()
+            self.processes = []
+        else:
+            parts = [region.collect(upper) for region, upper in zip(self.regions, self.from_above)]
+            self.regions = []
+
+        world = self.world
+        for part in parts:
+            for building in part:
+                building.economy = world.economy
+                world.grid[building.row][building.col] = building
+        # Пересборка энергосети сбрасывает efficiency, а в World.tick она
+        # держится до следующего пересчёта баланса: возвращаем её
+        efficiency = [(building, building.efficiency) for part in parts for building in part]
+        world.relink_all()
+        for building, value in efficiency:
+            building.efficiency = value
+        return world
+
+    def close(self):
+        if self.processes:
+            self._finish(_STOP)
+            for process in self.processes:
+                process.join()
+            self.processes = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        if self.processes or self.regions:
+            self.collect()
+        self.close()
+
@@ -0,0 +1,307 @@
+"""Удалённое управление и телеметрия запущенной симуляции.
+
+Сервер asyncio работает в своём потоке на loopback TCP или unix-сокете.
+Протокол — JSON по строке на сообщение.
+
+Сервер -> клиент, не чаще rate раз в секунду:
+    {"type": "telemetry", "ticks": [[tick, time, balance], ...],
+     "state": {"tick": ..., "running": ..., "balance": ..., "production_stats": {...},
+               "sales_stats": {...}, "buildings": [[row, col, "Mine", "ore"], ...]}}
+
+Клиент -> сервер:
+    {"cmd": "place", "type": "Mine", "row": 0, "col": 0, "dir": "RIGHT"}
+    {"cmd": "remove", "row": 0, "col": 0}
+    {"cmd": "undo"} / {"cmd": "redo"}
+    {"cmd": "pause"} / {"cmd": "resume"} / {"cmd": "speed", "value": 2.0}
+
+Поток симуляции никогда не ждёт клиентов: publish() только кладёт сводку
+тика в ограниченную очередь, а полный снимок состояния снимает не чаще
+rate раз в секунду. Медленным клиентам кадры пропускаются.
+
+    python remote.py watch            — печатать телеметрию
+    python remote.py send '{"cmd": "pause"}'
+"""
+import argparse
+import asyncio
+import collections
+import json
+import math
+import queue
+import sys
+import threading
+import time
+from typing import Optional
+
+from simulation import World, BUILDING_TYPES, Direction
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+COMMANDS = {"place", "remove", "undo", "redo", "pause", "resume", "speed"}
+
+# Сколько сводок тиков держим между отправками и сколько байт может
+# скопиться в буфере клиента, прежде чем мы начнём пропускать ему кадры
+MAX_PENDING_TICKS = 1000
+MAX_CLIENT_BUFFER = 1 << 20
+
+
+def capture_state(world: World, running: bool) -> dict:
+    """Снимок состояния мира для телеметрии (вызывается в потоке симуляции)"""
+    economy = world.economy
+    return {
+        "tick": world.ticks,
+        "time": world.time,
+        "running": running,
+        "balance": economy.balance,
+        "production_stats": {rt.value: v for rt, v in economy.production_stats.items()},
+        "sales_stats": {rt.value: v for rt, v in economy.sales_stats.items()},
+        "buildings": [[b.row, b.col, b.__class__.__name__, b.item.value if b.item else None]
+                      for b in world.buildings()],
+    }
+
+
+def parse_command(line: bytes) -> dict:
+    """Разбирает и проверяет команду клиента; ValueError при ошибке"""
+    try:
+        cmd = json.loads(line)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"неверный JSON: {e}") from None
+    # Проверка типа — до поиска в множествах: список или объект в них
+    # дали бы TypeError вместо ответа клиенту
+    if not isinstance(cmd, dict) or not _is_name(cmd.get("cmd"), COMMANDS):
+        raise ValueError("ожидается объект с полем cmd из " + ", ".join(sorted(COMMANDS)))
+    if cmd["cmd"] == "place":
+        if not _is_name(cmd.get("type"), BUILDING_TYPES):
+            raise ValueError(f"неизвестный тип здания {cmd.get('type')!r}")
+        if not _is_name(cmd.setdefault("dir", "RIGHT"), Direction.__members__):
+            raise ValueError(f"неизвестное направление {cmd['dir']!r}")
+    if cmd["cmd"] in ("place", "remove"):
+        if not _is_number(cmd.get("row"), int) or not _is_number(cmd.get("col"), int):
+            raise ValueError("нужны целые row и col")
+    if cmd["cmd"] == "speed" and not (_is_number(cmd.get("value"), (int, float))
+                                      and math.isfinite(cmd["value"])):
+        raise ValueError("нужно конечное числовое value")
+    return cmd
+
+
+def _is_name(value, names) -> bool:
+    return isinstance(value, str) and value in names
+
+
+def _is_number(value, types) -> bool:
+    # JSON true/false приходят как bool, а bool — подкласс int
+    return isinstance(value, types) and not isinstance(value, bool)
+
+
+def apply_world_command(world: World, cmd: dict) -> bool:
+    """Выполняет команду, меняющую сетку. False — команда не про сетку"""
+    if cmd["cmd"] == "place":
+        world.place(cmd["row"], cmd["col"], BUILDING_TYPES[cmd["type"]], Direction[cmd["dir"]])
+    elif cmd["cmd"] == "remove":
+        world.remove_many([(cmd["row"], cmd["col"])])
+    elif cmd["cmd"] == "undo":
+        world.undo()
+    elif cmd["cmd"] == "redo":
+        world.redo()
+    else:
+        return False
+    return True
+
+
+class TelemetryServer:
+    """Сервер телеметрии и команд в отдельном потоке со своим event loop"""
+
+    def __init__(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT,
+                 path: Optional[str] = None, rate: float = 10.0):
+        self.host = host
+        self.port = port
+        self.path = path
+        self.interval = 1.0 / rate
+
+        # Команды клиентов; разбираются потоком симуляции через poll_commands()
+        self.commands: "queue.SimpleQueue[dict]" = queue.SimpleQueue()
+
+        # Пишет только поток симуляции, читает только поток сервера
+        self._ticks = collections.deque(maxlen=MAX_PENDING_TICKS)
+        self._state: Optional[dict] = None
+        self._next_capture = 0.0
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._clients = set()
+        self._client_tasks = set()
+        self._ready = threading.Event()
+        # Ошибка запуска (порт занят, неверный путь сокета) для start()
+        self._error: Optional[BaseException] = None
+        self._stopping: Optional[asyncio.Event] = None
+
+    # ---------------------------------------
+    # СТОРОНА СИМУЛЯЦИИ
+    # ---------------------------------------
+    def publish(self, world: World, running: bool):
+        """Сообщает о тике. Дёшево и без блокировок, вызывать каждый тик"""
+        self._ticks.append((world.ticks, world.time, world.economy.balance))
+        now = time.monotonic()
+        if now >= self._next_capture:
+            self._next_capture = now + self.interval
+            self._state = capture_state(world, running)
+
+    def poll_commands(self):
+        """Забирает все накопившиеся команды, не блокируясь"""
+        commands = []
+        while True:
+            try:
+                commands.append(self.commands.get_nowait())
+            except queue.Empty:
+                return commands
+
+    # ---------------------------------------
+    # ЗАПУСК И ОСТАНОВКА
+    # ---------------------------------------
+    def start(self):
+        """Запускает поток сервера; ошибка привязки сокета пробрасывается сюда"""
+        self._thread = threading.Thread(target=self._run, name="telemetry-server", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        if self._error is not None:
+            self._thread.join()
+            self._loop = None
+            raise self._error
+
+    def stop(self):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._stopping.set)
+            self._thread.join()
+            self._loop = None
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        try:
+            self._loop.run_until_complete(self._serve())
+        except BaseException as e:
+            if self._ready.is_set():
+                raise
+            self._error = e
+        finally:
+            self._ready.set()
+            self._loop.close()
+
+    async def _serve(self):
+        self._stopping = asyncio.Event()
+        if self.path:
+            server = await asyncio.start_unix_server(self._handle_client, path=self.path)
+        else:
+            server = await asyncio.start_server(self._handle_client, self.host, self.port)
+            self.port = server.sockets[0].getsockname()[1]
+        self._ready.set()
+
+        broadcaster = asyncio.create_task(self._broadcast())
+        async with server:
+            await self._stopping.wait()
+            # Закрываем клиентов до выхода из async with: начиная с Python 3.12
+            # wait_closed() ждёт, пока закроются все соединения. Закрытый
+            # сокет завершает readline() в обработчике, и тот выходит сам
+            server.close()
+            broadcaster.cancel()
+            for writer in list(self._clients):
+                writer.close()
+            await asyncio.gather(broadcaster, *self._client_tasks, return_exceptions=True)
+
+    # ---------------------------------------
+    # СТОРОНА КЛИЕНТОВ
+    # ---------------------------------------
+    async def _broadcast(self):
+        last_state = None
+        while True:
+            await asyncio.sleep(self.interval)
+            ticks = []
+            while self._ticks:
+                ticks.append(self._ticks.popleft())
+            state = self._state
+            if not ticks and state is last_state:
+                continue
+
+            # Сериализуем один раз на всех клиентов; снимок — только новый
+            message = {"type": "telemetry", "ticks": ticks}
+            if state is not None and state is not last_state:
+                message["state"] = state
+            last_state = state
+            data = (json.dumps(message, ensure_ascii=False) + "\n").encode()
+            for writer in list(self._clients):
+                if writer.transport.get_write_buffer_size() < MAX_CLIENT_BUFFER:
+                    writer.write(data)
+
+    async def _handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        task = asyncio.current_task()
+        self._client_tasks.add(task)
+        self._clients.add(writer)
+        try:
+            while line := await reader.readline():
+                try:
+                    self.commands.put(parse_command(line))
+                    reply = {"type": "ack", "ok": True}
+                except ValueError as e:
+                    reply = {"type": "ack", "ok": False, "error": str(e)}
+                writer.write((json.dumps(reply, ensure_ascii=False) + "\n").encode())
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self._clients.discard(writer)
+            self._client_tasks.discard(task)
+            writer.close()
+
+
+# =========================================================
+#                   ЛОКАЛЬНЫЙ КЛИЕНТ
+# =========================================================
+async def _connect(args):
+    if args.socket:
+        return await asyncio.open_unix_connection(args.socket)
+    return await asyncio.open_connection(args.host, args.port)
+
+
+async def watch(args):
+    reader, writer = await _connect(args)
+    while line := await reader.readline():
+        message = json.loads(line)
+        state = message.get("state")
+        if state is None:
+            continue
+        print(f"тик {state['tick']:>8}  баланс ${state['balance']:,}  "
+              f"зданий {len(state['buildings'])}  {'идёт' if state['running'] else 'пауза'}")
+    writer.close()
+
+
+async def send(args):
+    reader, writer = await _connect(args)
+    writer.write(args.command.encode() + b"\n")
+    await writer.drain()
+    while line := await reader.readline():
+        message = json.loads(line)
+        if message["type"] == "ack":
+            print(json.dumps(message, ensure_ascii=False))
+            break
+    writer.close()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--socket", help="путь к unix-сокету вместо TCP")
+    commands = parser.add_subparsers(dest="action", required=True)
+    commands.add_parser("watch", help="печатать телеметрию")
+    send_parser = commands.add_parser("send", help="отправить команду (JSON)")
+    send_parser.add_argument("command")
+
+    args = parser.parse_args()
+    try:
+        asyncio.run(watch(args) if args.action == "watch" else send(args))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
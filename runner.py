@@ -0,0 +1,197 @@
+"""Симуляция в отдельном потоке с фиксированной частотой тиков.
+
+Поток симуляции владеет миром. Всё, что приходит снаружи (мышь,
+клавиатура, удалённые команды), ставится в очередь команд и выполняется
+между тиками. После каждого тика поток публикует неизменяемый снимок
+(Snapshot): отрисовка читает текущий снимок без блокировок, а следующий
+собирается отдельно и подменяет его одним присваиванием ссылки.
+Частота кадров и частота симуляции друг от друга не зависят.
+"""
+import queue
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, NamedTuple, Optional, Tuple
+
+import remote
+from simulation import World, Direction, ResourceType
+
+
+class CellState(NamedTuple):
+    """Здание в снимке: тип, позиция, направление и содержимое"""
+    kind: type
+    row: int
+    col: int
+    direction: Direction
+    item: Optional[ResourceType]
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    """Неизменяемое состояние мира после тика.
+
+    layout, index и chunk_versions меняются только вместе с world.version
+    и разделяются всеми снимками одной версии; items собирается заново
+    каждый тик.
+    """
+    rows: int
+    cols: int
+    tick: int
+    time: float
+    running: bool
+    time_scale: float
+    version: int
+    balance: int
+    daily_profit: int
+    total_production: int
+    total_sales: int
+    layout: Tuple[Tuple[type, int, int, Direction], ...]
+    index: Dict[Tuple[int, int], int]
+    chunk_versions: Dict[Tuple[int, int], int]
+    items: Tuple[Optional[ResourceType], ...]
+
+    def cells(self):
+        for (kind, row, col, direction), item in zip(self.layout, self.items):
+            yield CellState(kind, row, col, direction, item)
+
+    def get(self, row: int, col: int) -> Optional[CellState]:
+        i = self.index.get((row, col))
+        if i is None:
+            return None
+        kind, row, col, direction = self.layout[i]
+        return CellState(kind, row, col, direction, self.items[i])
+
+
+class SimulationThread:
+    """Крутит World.tick с фиксированным шагом и публикует снимки"""
+
+    def __init__(self, world: World, tick_rate: float = 60.0, server=None, day_length: float = 60.0):
+        self.world = world
+        self.delta_time = 1.0 / tick_rate
+        self.server = server
+        self.running = False
+        self.time_scale = 1.0
+        self.day_timer = 0.0
+        self.day_length = day_length
+
+        self.commands: "queue.SimpleQueue[dict]" = queue.SimpleQueue()
+
+        # Статичная часть снимка, пересобирается при смене world.version
+        self._buildings = []
+        self._layout = ()
+        self._index = {}
+        self._chunk_versions = {}
+        self._layout_version = -1
+
+        self.snapshot: Snapshot = self._capture()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # ---------------------------------------
+    # СТОРОНА UI
+    # ---------------------------------------
+    def submit(self, cmd: dict):
+        """Ставит команду в очередь; выполнится перед следующим тиком"""
+        self.commands.put(cmd)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="simulation", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    # ---------------------------------------
+    # ПОТОК СИМУЛЯЦИИ
+    # ---------------------------------------
+    def _run(self):
+        next_tick = time.monotonic()
+        while not self._stop.is_set():
+            self.step()
+
+            next_tick += self.delta_time
+            delay = next_tick - time.monotonic()
+            if delay > 0:
+                self._stop.wait(delay)
+            elif delay < -0.25:
+                # Сильно отстали (тик дольше шага) — не пытаемся догнать пачкой
+                next_tick = time.monotonic()
+
+    def step(self):
+        """Один шаг: команды, тик, публикация снимка и телеметрии"""
+        self._drain_commands()
+
+        if self.running:
+            delta_time = self.delta_time * self.time_scale
+            self.day_timer += delta_time
+            if self.day_timer >= self.day_length:
+                self.day_timer = 0
+                economy = self.world.economy
+                economy.daily_profit = economy.total_sales - int(economy.total_production * 0.7)
+            self.world.tick(delta_time)
+
+        self.snapshot = self._capture()
+        if self.server:
+            self.server.publish(self.world, self.running)
+
+    def _drain_commands(self):
+        pending = []
+        while True:
+            try:
+                pending.append(self.commands.get_nowait())
+            except queue.Empty:
+                break
+        if self.server:
+            pending.extend(self.server.poll_commands())
+        for cmd in pending:
+            self.handle_command(cmd)
+
+    def handle_command(self, cmd: dict):
+        world = self.world
+        if remote.apply_world_command(world, cmd):
+            return
+        name = cmd["cmd"]
+        if name == "place_many":
+            world.place_many(cmd["placements"])
+        elif name == "remove_many":
+            world.remove_many(cmd["cells"])
+        elif name == "clear":
+            world.clear()
+        elif name == "pause":
+            self.running = False
+        elif name == "resume":
+            self.running = True
+        elif name == "toggle":
+            self.running = not self.running
+        elif name == "speed":
+            self.time_scale = max(0.0, float(cmd["value"]))
+
+    def _capture(self) -> Snapshot:
+        world = self.world
+        if self._layout_version != world.version:
+            self._buildings = list(world.buildings())
+            self._layout = tuple((b.__class__, b.row, b.col, b.direction) for b in self._buildings)
+            self._index = {(b.row, b.col): i for i, b in enumerate(self._buildings)}
+            self._chunk_versions = dict(world.chunk_versions)
+            self._layout_version = world.version
+
+        economy = world.economy
+        return Snapshot(
+            rows=world.rows,
+            cols=world.cols,
+            tick=world.ticks,
+            time=world.time,
+            running=self.running,
+            time_scale=self.time_scale,
+            version=self._layout_version,
+            balance=economy.balance,
+            daily_profit=economy.daily_profit,
+            total_production=economy.total_production,
+            total_sales=economy.total_sales,
+            layout=self._layout,
+            index=self._index,
+            chunk_versions=self._chunk_versions,
+            items=tuple(b.item for b in self._buildings),
+        )
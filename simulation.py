@@ -0,0 +1,1244 @@
+"""Симуляция фабрики без графики: ресурсы, экономика, здания и мир.
+
+Модуль не зависит от arcade, поэтому его можно импортировать в консольных
+скриптах и рабочих процессах без затрат на окно и шрифты.
+"""
+import os
+from typing import Optional, List, Tuple, Iterable, Dict
+from dataclasses import dataclass
+from enum import Enum
+
+# Размер поля по умолчанию (помещается в окно игры)
+ROWS = 12
+COLS = 21
+
+# Сторона квадратного фрагмента поля в клетках: по фрагментам мир
+# отмечает изменения, чтобы UI перерисовывал только затронутые части
+CHUNK_SIZE = 32
+
+
+class ResourceType(Enum):
+    ORE = "ore"
+    COAL = "coal"
+    IRON = "iron"
+    STEEL = "steel"
+    COPPER = "copper"
+    CIRCUIT = "circuit"
+    ENGINE = "engine"
+    ROBOT = "robot"
+    ELECTRONICS = "electronics"
+    CAR = "car"
+    COMPUTER = "computer"
+
+
+@dataclass
+class Resource:
+    name: str
+    value: int
+    color: Tuple[int, int, int]
+    icon: str
+
+
+RESOURCES = {
+    ResourceType.ORE: Resource("Руда", 50, (139, 69, 19), "●"),
+    ResourceType.COAL: Resource("Уголь", 30, (34, 34, 34), "◆"),
+    ResourceType.IRON: Resource("Железо", 100, (169, 169, 169), "■"),
+    ResourceType.STEEL: Resource("Сталь", 250, (192, 192, 192), "▲"),
+    ResourceType.COPPER: Resource("Медь", 150, (184, 115, 51), "★"),
+    ResourceType.CIRCUIT: Resource("Микросхема", 500, (0, 255, 127), "⊕"),
+    ResourceType.ENGINE: Resource("Двигатель", 800, (255, 69, 0), "◈"),
+    ResourceType.ROBOT: Resource("Робот", 1500, (0, 191, 255), "⚙"),
+    ResourceType.ELECTRONICS: Resource("Электроника", 1200, (147, 112, 219), "☢"),
+    ResourceType.CAR: Resource("Автомобиль", 5000, (220, 20, 60), "🚗"),
+    ResourceType.COMPUTER: Resource("Компьютер", 3000, (30, 144, 255), "💻"),
+}
+
+
+# =========================================================
+#                   ЭКОНОМИКА
+# =========================================================
+class Economy:
+    def __init__(self, start_money=15000):
+        self.balance = start_money
+        self.daily_profit = 0
+        self.total_production = 0
+        self.total_sales = 0
+        self.production_stats = {resource_type: 0 for resource_type in ResourceType}
+        self.sales_stats = {resource_type: 0 for resource_type in ResourceType}
+
+    def spend(self, amount: int) -> bool:
+        if self.balance >= amount:
+            self.balance -= amount
+            return True
+        return False
+
+    def earn(self, amount: int, resource_type: ResourceType):
+        self.balance += amount
+        self.total_sales += amount
+        self.sales_stats[resource_type] += amount
+        self.daily_profit = self.total_sales - int(self.total_production * 0.7)
+
+    def track_production(self, resource_type: ResourceType, cost: int):
+        self.total_production += cost
+        self.production_stats[resource_type] += cost
+
+    def copy(self) -> "Economy":
+        twin = Economy(self.balance)
+        twin.daily_profit = self.daily_profit
+        twin.total_production = self.total_production
+        twin.total_sales = self.total_sales
+        twin.production_stats = dict(self.production_stats)
+        twin.sales_stats = dict(self.sales_stats)
+        return twin
+
+
+economy = Economy()
+
+class Direction(Enum):
+    UP = (1, 0)
+    DOWN = (-1, 0)
+    LEFT = (0, -1)
+    RIGHT = (0, 1)
+# =========================================================
+#                БАЗОВЫЙ КЛАСС МОДУЛЯ
+# =========================================================
+class Building:
+    cost = 0
+    upkeep = 0
+    cycle_time = 1.0
+    input_types = []
+    output_type = None
+    production_cost = 0
+    # Энергосеть: потребление при подключении, текущая выработка
+    # и проводит ли здание ток к соседям (станции и опоры)
+    power_demand = 0
+    power_supply = 0
+    conducts_power = False
+
+    def __init__(self, row: int, col: int):
+        self.row = row
+        self.col = col
+        self.direction = Direction.RIGHT
+        self.item = None
+        self.timer = 0.0
+        self.progress = 0.0
+        self.efficiency = 1.0
+        self.economy = economy
+        # Здание на клетке выхода; проставляется миром при изменении топологии
+        self.target: Optional["Building"] = None
+
+    @property
+    def kind(self) -> type:
+        """Тип здания; у снимков состояния (runner.CellState) — такое же поле"""
+        return self.__class__
+
+    def get_output_coords(self) -> Tuple[int, int]:
+        dr, dc = self.direction.value
+        return self.row + dr, self.col + dc
+
+    def get_input_coords(self) -> List[Tuple[int, int]]:
+        all_dirs = [Direction.UP, Direction.DOWN, Direction.LEFT, Direction.RIGHT]
+        return [(self.row + d.value[0], self.col + d.value[1])
+                for d in all_dirs if d != self.direction]
+
+    def can_accept(self, item_type: ResourceType, from_coords: Tuple[int, int]) -> bool:
+        # Конвейеры принимают всё, заводы — только нужное
+        if isinstance(self, Conveyor):
+            return self.item is None
+        is_input_side = from_coords in self.get_input_coords()
+        return self.item is None and item_type in self.input_types and is_input_side
+
+    def accept_item(self, item_type: ResourceType, from_coords: Tuple[int, int]) -> bool:
+        if self.can_accept(item_type, from_coords):
+            self.item = item_type
+            return True
+        return False
+
+    def do_cycle(self, delta_time: float) -> bool:
+        # efficiency задаёт энергосеть: с питанием цикл идёт быстрее
+        self.timer += delta_time * self.efficiency
+        if self.timer >= self.cycle_time:
+            self.timer = 0.0
+            return True
+        return False
+
+    def charge_upkeep(self):
+        self.economy.spend(self.upkeep)
+
+    def clone(self) -> "Building":
+        """Копия здания со всем состоянием (для форков мира)"""
+        # То же, что copy.copy, но без протокола __reduce_ex__: в разы быстрее
+        twin = object.__new__(self.__class__)
+        twin.__dict__.update(self.__dict__)
+        return twin
+
+    def process(self, world, delta_time: float):
+        """Пытается передать предмет следующему зданию"""
+        if self.item is not None:
+            target = self.target
+            if target and target.accept_item(self.item, (self.row, self.col)):
+                self.item = None
+
+
+# =========================================================
+#                   ПРОМЫШЛЕННЫЕ МОДУЛИ
+# =========================================================
+
+
+
+
+class Mine(Building):
+    cost = 300
+    upkeep = 5
+    cycle_time = 3.0
+    output_type = ResourceType.ORE
+    production_cost = 20
+    power_demand = 10
+
+    def process(self, world, delta_time):
+        if self.do_cycle(delta_time):
+            self.charge_upkeep()
+            if self.item is None and self.economy.spend(self.production_cost):
+                self.item = ResourceType.ORE
+                self.economy.track_production(ResourceType.ORE, self.production_cost)
+        super().process(world, delta_time) # Выталкиваем руду
+
+
+class CoalMine(Building):
+    cost = 350
+    upkeep = 7
+    cycle_time = 2.5
+    output_type = ResourceType.COAL
+    production_cost = 15
+    power_demand = 10
+
+    def process(self, world, delta_time: float):
+        if self.do_cycle(delta_time):
+            self.charge_upkeep()
+            if self.item is None and self.economy.spend(self.production_cost):
+                self.item = ResourceType.COAL
+                self.economy.track_production(ResourceType.COAL, self.production_cost)
+        super().process(world, delta_time)
+
+
+class Smelter(Building):
+    cost = 800
+    upkeep = 15
+    cycle_time = 4.0
+    input_types = [ResourceType.ORE, ResourceType.COAL]
+    output_type = ResourceType.IRON
+    production_cost = 50
+    power_demand = 20
+
+    def __init__(self, row: int, col: int):
+        super().__init__(row, col)
+        self.input_a = None
+        self.input_b = None
+        self.heat = 0.0
+        self.is_active = False
+
+    def can_accept(self, item_type: ResourceType, from_coords: Tuple[int, int]) -> bool:
+        is_input_side = from_coords in self.get_input_coords()
+        has_space = (self.input_a is None or self.input_b is None)
+        return is_input_side and has_space and item_type in self.input_types
+
+    def accept_item(self, item_type: ResourceType, from_coords: Tuple[int, int]) -> bool:
+        if self.can_accept(item_type, from_coords):
+            if self.input_a is None:
+                self.input_a = item_type
+            else:
+                self.input_b = item_type
+            return True
+        return False
+
+    def process(self, world, delta_time: float):
+        if self.input_a and self.input_b and not self.is_active and self.item is None:
+            self.is_active = True
+            self.progress = 0.0
+
+        if self.is_active:
+            self.progress += delta_time * self.efficiency
+            if self.progress >= self.cycle_time:
+                self.item = ResourceType.IRON
+                self.input_a = None
+                self.input_b = None
+                self.is_active = False
+                self.progress = 0.0
+                self.economy.track_production(ResourceType.IRON, self.production_cost)
+                self.charge_upkeep()
+
+        super().process(world, delta_time)  # Выталкиваем металл
+
+
+class SteelMill(Building):
+    cost = 1200
+    upkeep = 25
+    cycle_time = 5.0
+    input_types = [ResourceType.IRON, ResourceType.COAL]
+    output_type = ResourceType.STEEL
+    production_cost = 100
+    power_demand = 30
+
+    def __init__(self, row: int, col: int):
+        super().__init__(row, col)
+        self.input_a = None
+        self.input_b = None
+
+    def can_accept(self, item_type: ResourceType, from_coords: Tuple[int, int]) -> bool:
+        is_input_side = from_coords in self.get_input_coords()
+        has_space = (self.input_a is None or self.input_b is None)
+        return is_input_side and has_space and item_type in self.input_types
+
+    def accept_item(self, item_type: ResourceType, from_coords: Tuple[int, int]) -> bool:
+        if self.can_accept(item_type, from_coords):
+            if self.input_a is None:
+                self.input_a = item_type
+            else:
+                self.input_b = item_type
+            return True
+        return False
+
+    def process(self, world, delta_time: float):
+        # Если есть ингредиенты и место для выхода — запускаем цикл
+        if self.input_a and self.input_b and self.item is None:
+            if self.do_cycle(delta_time):
+                self.charge_upkeep()
+                if self.economy.spend(self.production_cost):
+                    self.item = ResourceType.STEEL
+                    self.input_a = None
+                    self.input_b = None
+                    self.economy.track_production(ResourceType.STEEL, self.production_cost)
+
+        # ВАЖНО: передаем результат дальше
+        super().process(world, delta_time)
+
+
+class AssemblyLine(Building):
+    cost = 2000
+    upkeep = 40
+    cycle_time = 6.0
+    input_types = [ResourceType.STEEL, ResourceType.ELECTRONICS]
+    output_type = ResourceType.CAR
+    production_cost = 500
+    power_demand = 40
+
+    def __init__(self, row: int, col: int):
+        super().__init__(row, col)
+        self.assembly_progress = 0.0
+        self.conveyor_position = 0.0
+
+    def process(self, world, delta_time: float):
+        if self.do_cycle(delta_time) and self.item is None:
+            self.charge_upkeep()
+            if self.economy.spend(self.production_cost):
+                self.item = ResourceType.CAR
+                self.economy.track_production(ResourceType.CAR, self.production_cost)
+
+
+class ElectronicsFactory(Building):
+    cost = 1500
+    upkeep = 30
+    cycle_time = 4.0
+    input_types = [ResourceType.COPPER, ResourceType.CIRCUIT]
+    output_type = ResourceType.ELECTRONICS
+    production_cost = 300
+    power_demand = 25
+
+    def __init__(self, row: int, col: int):
+        super().__init__(row, col)
+
+    def process(self, world, delta_time: float):
+        if self.do_cycle(delta_time) and self.item is None:
+            self.charge_upkeep()
+            if self.economy.spend(self.production_cost):
+                self.item = ResourceType.ELECTRONICS
+                self.economy.track_production(ResourceType.ELECTRONICS, self.production_cost)
+
+        # ВАЖНО: Этот вызов передает созданный предмет на конвейер или в маркет
+        super().process(world, delta_time)
+
+class RobotFactory(Building):
+    cost = 3000
+    upkeep = 50
+    cycle_time = 8.0
+    input_types = [ResourceType.STEEL, ResourceType.ELECTRONICS, ResourceType.CIRCUIT]
+    output_type = ResourceType.ROBOT
+    production_cost = 800
+    power_demand = 40
+
+    def __init__(self, row: int, col: int):
+        super().__init__(row, col)
+        self.arm_rotation = 0.0
+        self.is_assembling = False
+
+    def process(self, world, delta_time: float):
+        if self.do_cycle(delta_time) and self.item is None:
+            self.charge_upkeep()
+            if self.economy.spend(self.production_cost):
+                self.item = ResourceType.ROBOT
+                self.economy.track_production(ResourceType.ROBOT, self.production_cost)
+        if self.is_assembling and self.progress >= 1.0:
+            self.is_assembling = False
+
+
+class ComputerFactory(Building):
+    cost = 2500
+    upkeep = 45
+    cycle_time = 7.0
+    input_types = [ResourceType.ELECTRONICS, ResourceType.CIRCUIT]
+    output_type = ResourceType.COMPUTER
+    production_cost = 600
+    power_demand = 40
+
+    def __init__(self, row: int, col: int):
+        super().__init__(row, col)
+
+    def process(self, world, delta_time: float):
+        if self.do_cycle(delta_time) and self.item is None:
+            self.charge_upkeep()
+            if self.economy.spend(self.production_cost):
+                self.item = ResourceType.COMPUTER
+                self.economy.track_production(ResourceType.COMPUTER, self.production_cost)
+
+        # ВАЖНО: Этот вызов передает созданный компьютер дальше
+        super().process(world, delta_time)
+
+
+class Conveyor(Building):
+    cost = 100
+    upkeep = 1
+    cycle_time = 0.5
+
+    def process(self, world, delta_time: float):
+        # Конвейеру достаточно просто вызывать базовый процесс передачи
+        super().process(world, delta_time)
+
+class Warehouse(Building):
+    cost = 500
+    upkeep = 10
+    capacity = 10
+
+    def __init__(self, row: int, col: int):
+        super().__init__(row, col)
+        self.storage = []
+        self.stored_types = {rt: 0 for rt in ResourceType}
+
+    def can_accept(self, item_type: ResourceType, from_coords: Tuple[int, int]) -> bool:
+        # Проверяем, что предмет заходит с одной из 3 сторон входа
+        is_input_side = from_coords in self.get_input_coords()
+        return is_input_side and len(self.storage) < self.capacity
+
+    def accept_item(self, item_type: ResourceType, from_coords: Tuple[int, int]) -> bool:
+        if self.can_accept(item_type, from_coords):
+            self.storage.append(item_type)
+            self.stored_types[item_type] += 1
+            return True
+        return False
+
+    def can_give_item(self) -> bool:
+        return len(self.storage) > 0
+
+    def clone(self) -> "Building":
+        twin = super().clone()
+        twin.storage = list(self.storage)
+        twin.stored_types = dict(self.stored_types)
+        return twin
+
+    def process(self, world, delta_time: float):
+        if self.do_cycle(delta_time) and self.item is None and self.storage:
+            self.item = self.storage.pop(0)
+            self.stored_types[self.item] -= 1
+
+
+class Market(Building):
+    cost = 400
+    upkeep = 8
+    cycle_time = 2.0
+
+    def __init__(self, row: int, col: int):
+        super().__init__(row, col)
+        self.sell_prices = {
+            ResourceType.ORE: 80, ResourceType.COAL: 50,
+            ResourceType.IRON: 150, ResourceType.STEEL: 350,
+            ResourceType.COPPER: 200, ResourceType.CIRCUIT: 600,
+            ResourceType.ELECTRONICS: 1500, ResourceType.ENGINE: 1000,
+            ResourceType.ROBOT: 2000, ResourceType.CAR: 6000,
+            ResourceType.COMPUTER: 4000,
+        }
+
+    # Исправляем сигнатуру: добавляем from_coords
+    def can_accept(self, item_type: ResourceType, from_coords: Tuple[int, int]) -> bool:
+        # Маркет принимает любой ресурс из списка цен, если в нем сейчас пусто
+        return self.item is None and item_type in self.sell_prices
+
+    # Также исправляем accept_item, чтобы соответствовать базе
+    def accept_item(self, item_type: ResourceType, from_coords: Tuple[int, int]) -> bool:
+        if self.can_accept(item_type, from_coords):
+            self.item = item_type
+            return True
+        return False
+
+    def process(self, world, delta_time: float):
+        # Если в Маркете есть предмет — продаем его немедленно
+        if self.item:
+            price = self.sell_prices.get(self.item, 0)
+            self.economy.earn(price, self.item)
+            self.item = None # ОЧЕНЬ ВАЖНО: очищаем слот, чтобы Маркет мог принять следующий предмет
+
+# =========================================================
+#                   ЭНЕРГЕТИКА
+# =========================================================
+class PowerPlant(Building):
+    """Жжёт уголь: пока горит, даёт сети power_output единиц мощности"""
+    cost = 1000
+    upkeep = 10
+    cycle_time = 10.0  # столько секунд горит одна единица угля
+    input_types = [ResourceType.COAL]
+    conducts_power = True
+    power_output = 100
+    fuel_capacity = 5
+
+    def __init__(self, row: int, col: int):
+        super().__init__(row, col)
+        self.fuel = 0
+        self.burn_left = 0.0
+
+    def can_accept(self, item_type: ResourceType, from_coords: Tuple[int, int]) -> bool:
+        is_input_side = from_coords in self.get_input_coords()
+        return is_input_side and item_type in self.input_types and self.fuel < self.fuel_capacity
+
+    def accept_item(self, item_type: ResourceType, from_coords: Tuple[int, int]) -> bool:
+        if self.can_accept(item_type, from_coords):
+            self.fuel += 1
+            return True
+        return False
+
+    def process(self, world, delta_time: float):
+        self.burn_left -= delta_time
+        if self.burn_left <= 0:
+            if self.fuel:
+                self.fuel -= 1
+                self.burn_left += self.cycle_time
+                self.charge_upkeep()
+            else:
+                self.burn_left = 0.0
+
+        supply = self.power_output if self.burn_left > 0 else 0
+        if supply != self.power_supply:
+            # Сеть пересчитает баланс своей компоненты один раз за тик
+            world.power.set_supply(self, supply)
+
+
+class PowerPole(Building):
+    """Опора ЛЭП: соединяет соседние клетки с сетью"""
+    cost = 50
+    conducts_power = True
+
+
+# =========================================================
+#                 РЕЕСТР ТИПОВ ЗДАНИЙ
+# =========================================================
+@dataclass(frozen=True)
+class BuildingType:
+    """Статичные данные типа здания: всё, что не меняется во время игры"""
+    cls: type
+    title: str
+    code: str                     # символ в текстовой раскладке
+    hotkey: object                # клавиша выбора в UI, None — нет на панели
+    color: Tuple[int, int, int]
+    icon: str
+
+    @property
+    def name(self) -> str:
+        return self.cls.__name__
+
+    @property
+    def cost(self) -> int:
+        return self.cls.cost
+
+    @property
+    def cycle_time(self) -> float:
+        return self.cls.cycle_time
+
+
+BUILDING_REGISTRY = {building_type.cls: building_type for building_type in (
+    BuildingType(Mine, "Шахта (руда)", "O", 1, (139, 69, 19), "⛏"),
+    BuildingType(CoalMine, "Угольная шахта", "K", 2, (34, 34, 34), "◆"),
+    BuildingType(Smelter, "Плавильня", "S", 3, (255, 140, 0), "🔥"),
+    BuildingType(SteelMill, "Сталелитейный завод", "T", 4, (192, 192, 192), "▲"),
+    BuildingType(Conveyor, "Конвейер", "B", 5, (70, 70, 70), "➜"),
+    BuildingType(ElectronicsFactory, "Электронный завод", "E", 6, (100, 100, 100), "☢"),
+    BuildingType(ComputerFactory, "Компьютерный завод", "C", 7, (100, 100, 100), "💻"),
+    BuildingType(Warehouse, "Склад", "W", 8, (160, 82, 45), "📦"),
+    BuildingType(Market, "Рынок", "M", "M", (152, 195, 121), "$"),
+    BuildingType(AssemblyLine, "Сборочная линия", "A", None, (220, 20, 60), "🚗"),
+    BuildingType(RobotFactory, "Завод роботов", "R", None, (0, 191, 255), "⚙"),
+    BuildingType(PowerPlant, "Электростанция", "P", 9, (230, 200, 60), "⚡"),
+    BuildingType(PowerPole, "Опора ЛЭП", "L", 0, (120, 110, 70), "┼"),
+)}
+
+# Производные индексы реестра
+BUILDING_TYPES = {building_type.name: building_type.cls for building_type in BUILDING_REGISTRY.values()}
+HOTKEYS = {building_type.hotkey: building_type.cls
+           for building_type in BUILDING_REGISTRY.values() if building_type.hotkey is not None}
+
+
+# =========================================================
+#                   МИР И ТОПОЛОГИЯ
+# =========================================================
+# Направление по шагу между соседними клетками: (dr, dc) -> Direction
+STEP_DIRECTIONS = {d.value: d for d in Direction}
+
+# Одна постройка в пакетной операции: строка, столбец, класс, направление
+Placement = Tuple[int, int, type, Direction]
+
+# Насколько быстрее работает здание в сети, полностью обеспеченной мощностью
+POWER_BOOST = 1.0
+
+
+class PowerGrid:
+    """Энергосети мира: компоненты связности станций, опор и потребителей.
+
+    Узлы — здания, которые проводят ток (станции, опоры) или потребляют его
+    (power_demand > 0). Соседние по стороне узлы связаны, если хотя бы один
+    из них проводит ток; два потребителя рядом сеть не образуют.
+
+    Связность поддерживается системой непересекающихся множеств: постройка —
+    несколько объединений, снос — пересборка только затронутой компоненты.
+    Выработка и потребление хранятся суммами по компоненте, поэтому
+    включение станции меняет одно число. balance() раз за тик пересчитывает
+    обеспеченность изменившихся сетей и переписывает efficiency зданиям
+    только если она изменилась. Потребитель вне сети работает как раньше
+    (efficiency = 1); в сети — до 1 + POWER_BOOST при полной обеспеченности.
+    """
+
+    def __init__(self, world: "World"):
+        self.world = world
+        self.nodes: Dict[Tuple[int, int], Building] = {}
+        self.parent: Dict[Tuple[int, int], Tuple[int, int]] = {}
+        # Для корня компоненты: её клетки, суммарные выработка и потребление
+        # и efficiency, выставленная её потребителям
+        self.members: Dict[Tuple[int, int], List[Tuple[int, int]]] = {}
+        self.supply: Dict[Tuple[int, int], float] = {}
+        self.demand: Dict[Tuple[int, int], float] = {}
+        self.level: Dict[Tuple[int, int], float] = {}
+        self.dirty = set()
+
+    @staticmethod
+    def is_node(building: Optional[Building]) -> bool:
+        return building is not None and (building.conducts_power or building.power_demand > 0)
+
+    def find(self, cell: Tuple[int, int]) -> Tuple[int, int]:
+        parent = self.parent
+        while parent[cell] != cell:
+            parent[cell] = parent[parent[cell]]
+            cell = parent[cell]
+        return cell
+
+    def network(self, cell: Tuple[int, int]) -> Optional[Tuple[int, int]]:
+        """Корень сети клетки или None, если здание в ней не подключено"""
+        return self.find(cell) if cell in self.parent else None
+
+    # ---------------------------------------
+    # СВЯЗНОСТЬ
+    # ---------------------------------------
+    def _union(self, a: Tuple[int, int], b: Tuple[int, int]):
+        ra, rb = self.find(a), self.find(b)
+        if ra == rb:
+            return
+        if len(self.members[ra]) < len(self.members[rb]):
+            ra, rb = rb, ra
+        self.parent[rb] = ra
+        self.members[ra].extend(self.members.pop(rb))
+        self.supply[ra] += self.supply.pop(rb)
+        self.demand[ra] += self.demand.pop(rb)
+        self.level.pop(rb, None)
+        self.dirty.discard(rb)
+        self.dirty.add(ra)
+
+    def _add(self, cell: Tuple[int, int], building: Building):
+        nodes = self.nodes
+        nodes[cell] = building
+        self.parent[cell] = cell
+        self.members[cell] = [cell]
+        self.supply[cell] = building.power_supply
+        self.demand[cell] = building.power_demand
+        self.dirty.add(cell)
+
+        row, col = cell
+        for dr, dc in STEP_DIRECTIONS:
+            neighbour = (row + dr, col + dc)
+            other = nodes.get(neighbour)
+            if other is not None and (building.conducts_power or other.conducts_power):
+                self._union(cell, neighbour)
+
+    def update(self, cells):
+        """Приводит сеть к сетке после изменения клеток"""
+        nodes, grid = self.nodes, self.world.grid
+        removed, added = [], []
+        for row, col in cells:
+            old = nodes.get((row, col))
+            new = grid[row][col]
+            new = new if self.is_node(new) else None
+            if old is not new:
+                if old is not None:
+                    removed.append((row, col))
+                if new is not None:
+                    added.append(((row, col), new))
+
+        if removed:
+            # Снос может разбить сеть: пересобираем затронутые компоненты целиком
+            survivors = []
+            for root in {self.find(cell) for cell in removed}:
+                for cell in self.members.pop(root):
+                    del self.parent[cell]
+                    survivors.append(cell)
+                del self.supply[root], self.demand[root]
+                self.level.pop(root, None)
+                self.dirty.discard(root)
+            for cell in removed:
+                nodes.pop(cell).efficiency = 1.0
+            survivors = [(cell, nodes.pop(cell)) for cell in survivors if cell in nodes]
+            for cell, building in survivors:
+                self._add(cell, building)
+
+        for cell, building in added:
+            if cell in nodes:
+                continue
+            self._add(cell, building)
+
+    def rebuild(self):
+        """Собирает сети заново по всей сетке"""
+        self.__init__(self.world)
+        for building in self.world.buildings():
+            if self.is_node(building):
+                building.efficiency = 1.0
+                self._add((building.row, building.col), building)
+
+    # ---------------------------------------
+    # БАЛАНС
+    # ---------------------------------------
+    def set_supply(self, building: Building, supply: float):
+        cell = (building.row, building.col)
+        if self.nodes.get(cell) is building:
+            root = self.find(cell)
+            self.supply[root] += supply - building.power_supply
+            self.dirty.add(root)
+        building.power_supply = supply
+
+    def balance(self):
+        """Пересчитывает efficiency потребителей в изменившихся сетях"""
+        if not self.dirty:
+            return
+        nodes = self.nodes
+        for root in self.dirty:
+            demand = self.demand[root]
+            efficiency = 1.0 + POWER_BOOST * min(1.0, self.supply[root] / demand) if demand else 1.0
+            if self.level.get(root) != efficiency:
+                self.level[root] = efficiency
+                for cell in self.members[root]:
+                    building = nodes[cell]
+                    if building.power_demand:
+                        building.efficiency = efficiency
+        self.dirty.clear()
+
+
+@dataclass
+class Edit:
+    """Одно изменение сетки для отмены и повтора.
+
+    Хранит только затронутые клетки: здания до и после изменения и
+    изменение баланса. Снесённые здания сохраняются вместе с состоянием
+    (содержимым, таймерами) и при отмене возвращаются такими же. Отмена и
+    повтор переписывают снятую сторону зданиями, которые действительно
+    стояли в сетке.
+    """
+    cells: List[Tuple[int, int]]
+    before: List[Optional[Building]]
+    after: List[Optional[Building]]
+    money: int
+
+
+class World:
+    """Сетка зданий, их экономика и связи «выход -> сосед».
+
+    Все изменения сетки идут через мир: он списывает стоимость одной
+    транзакцией, перестраивает связи только вокруг изменённых клеток
+    и увеличивает version, по которой UI пересобирает статичную графику.
+    Каждое изменение записывается в историю (undo/redo).
+
+    fork() копирует мир за O(рядов): ряды сетки и здания в них остаются
+    общими с исходным миром, пока один из миров не изменит ряд (копия
+    при записи). Перед тиком мир забирает себе все общие ряды.
+    """
+
+    def __init__(self, rows: int = ROWS, cols: int = COLS, economy: Optional[Economy] = None):
+        self.rows = rows
+        self.cols = cols
+        self.economy = economy if economy is not None else Economy()
+        self.grid: List[List[Optional[Building]]] = [[None for _ in range(cols)] for _ in range(rows)]
+        self.version = 0
+        # Фрагмент (row // CHUNK_SIZE, col // CHUNK_SIZE) -> version его последнего изменения
+        self.chunk_versions: Dict[Tuple[int, int], int] = {}
+        self.ticks = 0
+        self.time = 0.0
+        self.undo_stack: List[Edit] = []
+        self.redo_stack: List[Edit] = []
+        # Ряды, разделяемые с форками: их здания нельзя менять на месте.
+        # После копирования ряда связи соседей могут указывать на здания
+        # другого мира — их перестраивает materialize() перед тиком
+        self._shared_rows = set()
+        self._stale_links = False
+        self.power = PowerGrid(self)
+
+    def in_bounds(self, row: int, col: int) -> bool:
+        return 0 <= row < self.rows and 0 <= col < self.cols
+
+    def get(self, row: int, col: int) -> Optional[Building]:
+        if self.in_bounds(row, col):
+            return self.grid[row][col]
+        return None
+
+    def buildings(self):
+        """Все здания в порядке обхода симуляции (по строкам)"""
+        for row in self.grid:
+            for building in row:
+                if building:
+                    yield building
+
+    # ---------------------------------------
+    # ИЗМЕНЕНИЕ СЕТКИ
+    # ---------------------------------------
+    def place_many(self, placements: List[Placement]) -> List[Building]:
+        """Строит пачку зданий одной транзакцией.
+
+        Занятые и лежащие за границей клетки пропускаются. Если денег не
+        хватает на все оставшиеся постройки, не строится ничего.
+        """
+        todo = []
+        seen = set()
+        for row, col, build_class, direction in placements:
+            if not self.in_bounds(row, col) or (row, col) in seen or self.grid[row][col] is not None:
+                continue
+            seen.add((row, col))
+            todo.append((row, col, build_class, direction))
+
+        total_cost = sum(build_class.cost for _, _, build_class, _ in todo)
+        if not todo or not self.economy.spend(total_cost):
+            return []
+
+        self._own_rows(row for row, _, _, _ in todo)
+        built = []
+        for row, col, build_class, direction in todo:
+            building = build_class(row, col)
+            building.direction = direction
+            building.economy = self.economy
+            self.grid[row][col] = building
+            built.append(building)
+
+        self.relink(seen)
+        self._record([(b.row, b.col) for b in built], [None] * len(built), built, -total_cost)
+        return built
+
+    def place(self, row: int, col: int, build_class: type, direction: Direction) -> Optional[Building]:
+        built = self.place_many([(row, col, build_class, direction)])
+        return built[0] if built else None
+
+    def remove_many(self, cells) -> int:
+        """Сносит здания в клетках, возвращает половину их стоимости"""
+        cells = [(row, col) for row, col in cells if self.get(row, col)]
+        self._own_rows(row for row, _ in cells)
+        refund = 0
+        removed = {}
+        for row, col in cells:
+            building = self.grid[row][col]
+            if building:
+                refund += building.cost // 2
+                self.grid[row][col] = None
+                removed[(row, col)] = building
+
+        if removed:
+            self.economy.balance += refund
+            self.relink(removed)
+            self._record(list(removed), list(removed.values()), [None] * len(removed), refund)
+        return refund
+
+    def clear(self):
+        """Сносит всё без возврата денег; отменяется как обычное изменение"""
+        self._own_rows(list(self._shared_rows))
+        removed = list(self.buildings())
+        self.grid = [[None for _ in range(self.cols)] for _ in range(self.rows)]
+        self.version += 1
+        for chunk in self.chunk_versions:
+            self.chunk_versions[chunk] = self.version
+        self.power.rebuild()
+        if removed:
+            self._record([(b.row, b.col) for b in removed], removed, [None] * len(removed), 0)
+
+    # ---------------------------------------
+    # ИСТОРИЯ ИЗМЕНЕНИЙ
+    # ---------------------------------------
+    def _record(self, cells, before, after, money: int):
+        self.undo_stack.append(Edit(cells, before, after, money))
+        self.redo_stack.clear()
+
+    def _apply(self, edit: Edit, forward: bool) -> bool:
+        buildings, money = (edit.after, edit.money) if forward else (edit.before, -edit.money)
+        if money < 0 and not self.economy.spend(-money):
+            return False
+        if money > 0:
+            self.economy.balance += money
+
+        self._own_rows(row for row, _ in edit.cells)
+        grid = self.grid
+        # Снятые здания запоминаем заново: в истории могут лежать объекты,
+        # которые после fork() остались у двойника, а в этом мире стоят копии
+        current = [grid[row][col] for row, col in edit.cells]
+        for (row, col), building in zip(edit.cells, buildings):
+            grid[row][col] = building
+        if forward:
+            edit.before = current
+        else:
+            edit.after = current
+        self.relink(edit.cells)
+        return True
+
+    def undo(self) -> bool:
+        """Отменяет последнее изменение. False — отменять нечего или не хватает денег"""
+        if not self.undo_stack or not self._apply(self.undo_stack[-1], forward=False):
+            return False
+        self.redo_stack.append(self.undo_stack.pop())
+        return True
+
+    def redo(self) -> bool:
+        """Повторяет последнее отменённое изменение"""
+        if not self.redo_stack or not self._apply(self.redo_stack[-1], forward=True):
+            return False
+        self.undo_stack.append(self.redo_stack.pop())
+        return True
+
+    # ---------------------------------------
+    # ФОРКИ
+    # ---------------------------------------
+    def fork(self) -> "World":
+        """Независимая копия мира со своей экономикой и пустой историей"""
+        twin = self.__class__(0, 0, economy=self.economy.copy())
+        twin.rows, twin.cols = self.rows, self.cols
+        twin.grid = list(self.grid)
+        twin.version = self.version
+        twin.chunk_versions = dict(self.chunk_versions)
+        twin.ticks, twin.time = self.ticks, self.time
+
+        # Теперь каждый ряд принадлежит обоим мирам
+        shared = set(range(self.rows))
+        self._shared_rows = shared
+        twin._shared_rows = set(shared)
+        return twin
+
+    def _own_rows(self, rows):
+        """Копирует общие ряды (вместе со зданиями) перед записью в них"""
+        shared = self._shared_rows
+        if not shared:
+            return
+        grid, economy, nodes = self.grid, self.economy, self.power.nodes
+        for row in set(rows) & shared:
+            shared.discard(row)
+            self._stale_links = True
+            cells = grid[row] = [b.clone() if b else None for b in grid[row]]
+            for building in cells:
+                if building:
+                    building.economy = economy
+                    # Энергосеть не должна трогать здания двойника
+                    cell = (row, building.col)
+                    if cell in nodes:
+                        nodes[cell] = building
+
+    def materialize(self):
+        """Забирает все общие ряды; после этого здания можно менять на месте"""
+        if self._shared_rows or self._stale_links:
+            self._own_rows(list(self._shared_rows))
+            self.relink_all()
+            self._stale_links = False
+
+    def relink_all(self):
+        """Проставляет связи выходов всем зданиям за один проход"""
+        grid, rows, cols = self.grid, self.rows, self.cols
+        for building in self.buildings():
+            dr, dc = building.direction.value
+            r, c = building.row + dr, building.col + dc
+            building.target = grid[r][c] if 0 <= r < rows and 0 <= c < cols else None
+        self.version += 1
+        self._touch_chunks((b.row, b.col) for b in self.buildings())
+        self.power.rebuild()
+
+    def relink(self, cells):
+        """Обновляет связи выходов для изменённых клеток и их соседей"""
+        dirty = set()
+        for row, col in cells:
+            dirty.add((row, col))
+            for dr, dc in STEP_DIRECTIONS:
+                dirty.add((row + dr, col + dc))
+
+        self._own_rows(row for row, _ in dirty)
+        for row, col in dirty:
+            building = self.get(row, col)
+            if building:
+                building.target = self.get(*building.get_output_coords())
+        self.version += 1
+        self._touch_chunks(cells)
+        self.power.update(cells)
+
+    def _touch_chunks(self, cells):
+        version = self.version
+        for row, col in cells:
+            self.chunk_versions[(row // CHUNK_SIZE, col // CHUNK_SIZE)] = version
+
+    # ---------------------------------------
+    # РАСКЛАДКИ
+    # ---------------------------------------
+    @classmethod
+    def from_layout(cls, source, economy: Optional[Economy] = None, charge: bool = False) -> "World":
+        """Строит мир из раскладки — пути к файлу или итерируемого набора строк.
+
+        Поддерживаются текстовая сетка и JSON Lines (см. parse_layout).
+        Файл читается построчно, без загрузки целиком. По умолчанию постройки
+        бесплатны; с charge=True стоимость списывается одной транзакцией.
+        Клетка вне сетки или занятая дважды — ValueError до любой постройки.
+        """
+        if isinstance(source, (str, os.PathLike)):
+            with open(source, encoding="utf-8") as f:
+                return cls.from_layout(f, economy, charge)
+
+        rows, cols, placements = parse_layout(source)
+        seen = set()
+        for row, col, _, _ in placements:
+            if not (0 <= row < rows and 0 <= col < cols):
+                raise ValueError(f"Клетка ({row}, {col}) вне сетки {rows}x{cols}")
+            if (row, col) in seen:
+                raise ValueError(f"Клетка ({row}, {col}) занята дважды")
+            seen.add((row, col))
+
+        world = cls(rows, cols, economy)
+        if charge:
+            if len(world.place_many(placements)) != len(placements):
+                raise ValueError("Недостаточно средств для постройки раскладки")
+            return world
+
+        grid, world_economy = world.grid, world.economy
+        for row, col, build_class, direction in placements:
+            building = build_class(row, col)
+            building.direction = direction
+            building.economy = world_economy
+            grid[row][col] = building
+        world.relink_all()
+        return world
+
+    def to_layout(self, f):
+        """Записывает мир текстовой сеткой (верхняя строка файла — верхний ряд)"""
+        for row in reversed(self.grid):
+            f.write("".join(LAYOUT_CODES[b.__class__] + DIRECTION_CODES[b.direction] if b else ".."
+                            for b in row) + "\n")
+
+    # ---------------------------------------
+    # СИМУЛЯЦИЯ
+    # ---------------------------------------
+    def tick(self, delta_time: float):
+        if self._shared_rows or self._stale_links:
+            self.materialize()
+        self.power.balance()
+        for row in self.grid:
+            for building in row:
+                if building:
+                    building.process(self, delta_time)
+        self.ticks += 1
+        self.time += delta_time
+
+
+# ---------------------------------------
+# ГЕОМЕТРИЯ ПАКЕТНОЙ ПОСТРОЙКИ
+# ---------------------------------------
+def line_path(start: Tuple[int, int], end: Tuple[int, int], default: Direction) -> List[Tuple[int, int, Direction]]:
+    """Г-образный путь от start до end: сначала по столбцам, потом по строкам.
+
+    Каждой клетке назначается направление на следующую клетку пути,
+    так что конвейер, уложенный по пути, везёт от start к end.
+    """
+    (r0, c0), (r1, c1) = start, end
+    cells = []
+    step_c = 1 if c1 >= c0 else -1
+    for c in range(c0, c1, step_c):
+        cells.append((r0, c))
+    step_r = 1 if r1 >= r0 else -1
+    for r in range(r0, r1, step_r):
+        cells.append((r, c1))
+    cells.append((r1, c1))
+
+    path = []
+    direction = default
+    for i, (r, c) in enumerate(cells):
+        if i + 1 < len(cells):
+            nr, nc = cells[i + 1]
+            direction = STEP_DIRECTIONS[(nr - r, nc - c)]
+        path.append((r, c, direction))
+    return path
+
+
+def rect_cells(start: Tuple[int, int], end: Tuple[int, int]) -> List[Tuple[int, int]]:
+    """Все клетки прямоугольника между двумя углами"""
+    (r0, c0), (r1, c1) = start, end
+    return [(r, c)
+            for r in range(min(r0, r1), max(r0, r1) + 1)
+            for c in range(min(c0, c1), max(c0, c1) + 1)]
+
+
+@dataclass
+class Blueprint:
+    """Скопированный фрагмент фабрики: смещения клеток, классы и направления"""
+    cells: List[Placement]
+    rows: int
+    cols: int
+
+    @classmethod
+    def capture(cls, world, start: Tuple[int, int], end: Tuple[int, int]) -> "Blueprint":
+        """Копирует прямоугольник из World или снимка (всё, у чего есть get(row, col))"""
+        area = rect_cells(start, end)
+        bottom = min(r for r, _ in area)
+        left = min(c for _, c in area)
+        cells = []
+        for r, c in area:
+            building = world.get(r, c)
+            if building:
+                cells.append((r - bottom, c - left, building.kind, building.direction))
+        return cls(cells,
+                   max(r for r, _ in area) - bottom + 1,
+                   max(c for _, c in area) - left + 1)
+
+    @property
+    def cost(self) -> int:
+        return sum(build_class.cost for _, _, build_class, _ in self.cells)
+
+    def placements(self, row: int, col: int) -> List[Placement]:
+        """Постройки чертежа с левым нижним углом в клетке (row, col)"""
+        return [(row + dr, col + dc, build_class, direction)
+                for dr, dc, build_class, direction in self.cells]
+
+
+# =========================================================
+#                   ФОРМАТ РАСКЛАДОК
+# =========================================================
+# Текстовая сетка: каждая клетка — два символа, код здания и направление
+# выхода ("O>" — шахта, выход вправо), ".." — пусто. Первая строка файла —
+# верхний ряд поля. Пустые строки и строки, начинающиеся с "#", пропускаются.
+#
+# JSON Lines: по объекту на строку, {"type": "Mine", "row": 0, "col": 0,
+# "dir": "RIGHT"}; необязательная первая строка {"rows": R, "cols": C}
+# задаёт размер поля, иначе он берётся по крайним зданиям.
+LAYOUT_CODES = {building_type.cls: building_type.code for building_type in BUILDING_REGISTRY.values()}
+LAYOUT_CLASSES = {code: build_class for build_class, code in LAYOUT_CODES.items()}
+
+DIRECTION_CODES = {Direction.RIGHT: ">", Direction.LEFT: "<", Direction.UP: "^", Direction.DOWN: "v"}
+LAYOUT_DIRECTIONS = {code: direction for direction, code in DIRECTION_CODES.items()}
+
+# Готовые пары «клетка -> (класс, направление)», чтобы разбор был одним поиском
+LAYOUT_CELLS = {code + arrow: (build_class, direction)
+                for code, build_class in LAYOUT_CLASSES.items()
+                for arrow, direction in LAYOUT_DIRECTIONS.items()}
+
+
+def parse_layout(lines: Iterable[str]) -> Tuple[int, int, List[Placement]]:
+    """Разбирает раскладку потоком строк, формат определяется по первой строке"""
+    lines = iter(lines)
+    for line in lines:
+        stripped = line.strip()
+        if not stripped or stripped.startswith("#"):
+            continue
+        if stripped.startswith("{"):
+            return _parse_layout_jsonl(stripped, lines)
+        return _parse_layout_text(line, lines)
+    return 0, 0, []
+
+
+def _parse_layout_text(first: str, lines: Iterable[str]) -> Tuple[int, int, List[Placement]]:
+    # Строки идут сверху вниз, а ряды считаются снизу, поэтому номера рядов
+    # проставляем после чтения, когда известна высота поля
+    parsed = []
+    cols = 0
+    line_no = 0
+    for line_no, line in enumerate(_chain_first(first, lines), 1):
+        line = line.rstrip()
+        if not line or line.startswith("#"):
+            continue
+        if len(line) % 2:
+            raise ValueError(f"Строка {line_no}: клетка из двух символов обрезана ({line[-1]!r} в конце)")
+        cells = []
+        for i in range(0, len(line), 2):
+            cell = line[i:i + 2]
+            if cell[0] == ".":
+                continue
+            kind = LAYOUT_CELLS.get(cell)
+            if kind is None:
+                raise ValueError(f"Строка {line_no}: неизвестная клетка {cell!r}")
+            cells.append((i // 2, kind))
+        parsed.append(cells)
+        cols = max(cols, len(line) // 2)
+
+    rows = len(parsed)
+    placements = [(rows - 1 - n, col) + kind
+                  for n, cells in enumerate(parsed)
+                  for col, kind in cells]
+    return rows, cols, placements
+
+
+def _parse_layout_jsonl(first: str, lines: Iterable[str]) -> Tuple[int, int, List[Placement]]:
+    import json  # нужен только для JSON-раскладок, не тянем его при импорте модуля
+
+    rows = cols = None
+    max_row = max_col = -1
+    placements = []
+    for line_no, line in enumerate(_chain_first(first, lines), 1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            raise ValueError(f"Строка {line_no}: {e}") from None
+        if not isinstance(record, dict):
+            raise ValueError(f"Строка {line_no}: ожидается объект, а не {record!r}")
+        if "type" not in record:
+            if "rows" not in record or "cols" not in record:
+                raise ValueError(f"Строка {line_no}: нужен либо type, либо rows и cols")
+            rows, cols = record["rows"], record["cols"]
+            if not (_is_int(rows) and _is_int(cols) and rows >= 0 and cols >= 0):
+                raise ValueError(f"Строка {line_no}: rows и cols должны быть целыми не меньше 0")
+            continue
+        kind = record["type"]
+        build_class = BUILDING_TYPES.get(kind) if isinstance(kind, str) else None
+        if build_class is None:
+            raise ValueError(f"Строка {line_no}: неизвестный тип здания {kind!r}")
+        if "row" not in record or "col" not in record:
+            raise ValueError(f"Строка {line_no}: у здания нет row или col")
+        name = record.get("dir", "RIGHT")
+        direction = Direction.__members__.get(name) if isinstance(name, str) else None
+        if direction is None:
+            raise ValueError(f"Строка {line_no}: неизвестное направление {name!r}")
+        row, col = record["row"], record["col"]
+        if not (_is_int(row) and _is_int(col)):
+            raise ValueError(f"Строка {line_no}: row и col должны быть целыми, а не {row!r}, {col!r}")
+        placements.append((row, col, build_class, direction))
+        max_row = max(max_row, row)
+        max_col = max(max_col, col)
+
+    if rows is None:
+        rows, cols = max_row + 1, max_col + 1
+    return rows, cols, placements
+
+
+def _is_int(value) -> bool:
+    # В JSON 1.0 — float, а true/false — bool, подкласс int
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _chain_first(first: str, lines: Iterable[str]):
+    yield first
+    yield from lines
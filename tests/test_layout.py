@@ -0,0 +1,91 @@
+"""Формат раскладок: разбор, запись и ошибки"""
+import io
+
+import pytest
+
+from simulation import (
+    World, Economy, Direction, Mine, Conveyor, Market, PowerPlant, parse_layout,
+)
+
+TEXT = """\
+# шахта -> конвейер -> рынок, над ними станция
+P^......
+O>B>M>..
+"""
+
+
+def test_text_layout_rows_count_from_bottom():
+    rows, cols, placements = parse_layout(io.StringIO(TEXT))
+    assert (rows, cols) == (2, 4)
+    assert sorted(placements, key=lambda p: (p[0], p[1])) == [
+        (0, 0, Mine, Direction.RIGHT),
+        (0, 1, Conveyor, Direction.RIGHT),
+        (0, 2, Market, Direction.RIGHT),
+        (1, 0, PowerPlant, Direction.UP),
+    ]
+
+
+def test_to_layout_round_trip():
+    world = World.from_layout(io.StringIO(TEXT))
+    out = io.StringIO()
+    world.to_layout(out)
+    assert out.getvalue() == "P^......\nO>B>M>..\n"
+
+    again = World.from_layout(io.StringIO(out.getvalue()))
+    assert [(b.row, b.col, b.__class__, b.direction) for b in again.buildings()] == \
+           [(b.row, b.col, b.__class__, b.direction) for b in world.buildings()]
+    assert again.grid[0][0].target is again.grid[0][1]
+
+
+def test_jsonl_layout_with_and_without_size():
+    lines = ['{"rows": 3, "cols": 5}',
+             '{"type": "Mine", "row": 0, "col": 0}',
+             '{"type": "Market", "row": 2, "col": 4, "dir": "UP"}']
+    world = World.from_layout(lines)
+    assert (world.rows, world.cols) == (3, 5)
+    assert world.grid[2][4].direction is Direction.UP
+
+    rows, cols, _ = parse_layout(lines[1:])
+    assert (rows, cols) == (3, 5)
+
+
+def test_charged_layout_spends_once_or_fails():
+    world = World.from_layout(io.StringIO(TEXT), economy=Economy(10_000), charge=True)
+    assert world.economy.balance == 10_000 - (Mine.cost + Conveyor.cost + Market.cost + PowerPlant.cost)
+    with pytest.raises(ValueError, match="Недостаточно средств"):
+        World.from_layout(io.StringIO(TEXT), economy=Economy(100), charge=True)
+
+
+@pytest.mark.parametrize("charge", [False, True])
+@pytest.mark.parametrize("lines, message", [
+    (['{"rows": 2, "cols": 2}', '{"type": "Mine", "row": 5, "col": 0}'], "вне сетки"),
+    (['{"rows": 2, "cols": 2}', '{"type": "Mine", "row": 0, "col": 0}',
+      '{"type": "Market", "row": 0, "col": 0}'], "занята дважды"),
+])
+def test_bad_cells_are_reported_before_building(lines, message, charge):
+    economy = Economy(10_000)
+    with pytest.raises(ValueError, match=message):
+        World.from_layout(lines, economy=economy, charge=charge)
+    assert economy.balance == 10_000
+
+
+@pytest.mark.parametrize("lines, message", [
+    (["O>X>"], "Строка 1: неизвестная клетка"),
+    (['{"rows": 2, "cols": 2}', '{"size": 3}'], "Строка 2: нужен либо type"),
+    (['{"type": "Castle", "row": 0, "col": 0}'], "Строка 1: неизвестный тип"),
+    (['{"type": "Mine", "row": 0}'], "Строка 1: у здания нет row или col"),
+    (['{"type": "Mine", "row": 0, "col": 0, "dir": "NORTH"}'], "Строка 1: неизвестное направление"),
+    (['{"rows": 2, "cols": 2}', '{"type": '], "Строка 2:"),
+    (["O>B^", "O>B"], "Строка 2: клетка из двух символов обрезана"),
+    (['{"type": "Mine", "row": "1", "col": 0}'], "Строка 1: row и col должны быть целыми"),
+    (['{"type": "Mine", "row": 1.0, "col": 0}'], "Строка 1: row и col должны быть целыми"),
+    (['{"type": "Mine", "row": 0, "col": true}'], "Строка 1: row и col должны быть целыми"),
+    (['{"rows": "2", "cols": 2}'], "Строка 1: rows и cols должны быть целыми"),
+    (['{"rows": 2, "cols": -1}'], "Строка 1: rows и cols должны быть целыми"),
+    (['{"type": [], "row": 0, "col": 0}'], "Строка 1: неизвестный тип"),
+    (['{"type": "Mine", "row": 0, "col": 0, "dir": {}}'], "Строка 1: неизвестное направление"),
+    (['{"rows": 2, "cols": 2}', '[1, 2]'], "Строка 2: ожидается объект"),
+])
+def test_parse_errors_name_the_line(lines, message):
+    with pytest.raises(ValueError, match=message):
+        parse_layout(lines)
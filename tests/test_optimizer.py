@@ -0,0 +1,39 @@
+"""Цель оптимизатора — прибыль при настоящем бюджете"""
+import random
+
+import pytest
+
+from optimizer import LayoutOptimizer, layout_cost, DIRECTIONS
+from simulation import BUILDING_REGISTRY
+
+
+def optimizer(budget: int, seed: int = 1) -> LayoutOptimizer:
+    return LayoutOptimizer(6, 8, budget, list(BUILDING_REGISTRY), seconds=60.0, dt=0.25, seed=seed)
+
+
+def random_layout(rnd: random.Random, budget: int):
+    layout = {}
+    for _ in range(rnd.randrange(1, 30)):
+        cell = (rnd.randrange(6), rnd.randrange(8))
+        layout[cell] = (rnd.choice(list(BUILDING_REGISTRY)), rnd.choice(DIRECTIONS))
+        if layout_cost(layout) > budget:
+            del layout[cell]
+    return layout
+
+
+@pytest.mark.parametrize("budget", [3000, 8000, 15000])
+def test_evaluate_equals_full_run_with_real_budget(budget):
+    rnd = random.Random(budget)
+    search, reference = optimizer(budget), optimizer(budget)
+    for _ in range(40):
+        layout = random_layout(rnd, budget)
+        assert search.evaluate(layout) == pytest.approx(reference.verify(layout), abs=1e-6)
+
+
+def test_best_score_is_what_the_full_run_gives():
+    # Раньше: оценка 74585/мин за раскладку на весь бюджет, целиком — 0/мин
+    search = LayoutOptimizer(8, 12, 15000, list(BUILDING_REGISTRY), seed=1)
+    best, score = search.run(400)
+    assert layout_cost(best) <= 15000
+    reference = LayoutOptimizer(8, 12, 15000, list(BUILDING_REGISTRY))
+    assert score == pytest.approx(reference.verify(best), abs=1e-6)
@@ -0,0 +1,138 @@
+"""Симуляция по регионам должна совпадать с World.tick"""
+import random
+import threading
+
+import pytest
+
+from bench import stress_layout, world_digest
+from parallel import PartitionedSimulation, split_rows
+from simulation import (
+    World, Economy, Direction, Conveyor, Warehouse, Market, Mine, CoalMine, Smelter, SteelMill,
+    PowerPlant, PowerPole, POWER_BOOST,
+)
+
+PALETTE = [Conveyor] * 6 + [Warehouse, Market, Mine, CoalMine, Smelter, SteelMill]
+
+
+def random_world(seed: int, money: int, rows: int = 12, cols: int = 8) -> World:
+    """Плотная случайная фабрика: предметы ходят через границы в обе стороны"""
+    rnd = random.Random(seed)
+    world = World(rows, cols, economy=Economy(money))
+    for row in range(rows):
+        for col in range(cols):
+            if rnd.random() < 0.9:
+                building = rnd.choice(PALETTE)(row, col)
+                building.direction = rnd.choice(list(Direction))
+                building.economy = world.economy
+                world.grid[row][col] = building
+    world.relink_all()
+    return world
+
+
+def serial(world: World, ticks: int, dt: float) -> World:
+    for _ in range(ticks):
+        world.tick(dt)
+    return world
+
+
+def partitioned(world: World, ticks: int, dt: float, regions: int, parallel: bool) -> World:
+    with PartitionedSimulation(world, regions=regions, parallel=parallel) as sim:
+        for _ in range(ticks):
+            sim.step(dt)
+    return world
+
+
+def assert_same(world: World, expected: World):
+    assert world_digest(world) == world_digest(expected)
+    assert world.economy.daily_profit == expected.economy.daily_profit
+    assert (world.ticks, world.time) == (expected.ticks, expected.time)
+
+
+@pytest.mark.parametrize("regions", [1, 2, 3, 5])
+def test_stress_map_matches_world_tick(regions):
+    expected = serial(World.from_layout(stress_layout(20, 10)), 300, 0.1)
+    world = partitioned(World.from_layout(stress_layout(20, 10)), 300, 0.1, regions, parallel=False)
+    assert_same(world, expected)
+
+
+def test_low_balance_never_goes_negative():
+    def build():
+        return World.from_layout(stress_layout(20, 16), economy=Economy(40))
+
+    expected = serial(build(), 300, 0.1)
+    world = partitioned(build(), 300, 0.1, 3, parallel=False)
+    assert_same(world, expected)
+    assert world.economy.balance >= 0
+
+
+@pytest.mark.parametrize("seed", range(6))
+@pytest.mark.parametrize("money", [300, 10 ** 6])
+def test_two_way_border_traffic_matches_world_tick(seed, money):
+    expected = serial(random_world(seed, money), 200, 0.7)
+    world = partitioned(random_world(seed, money), 200, 0.7, 4, parallel=False)
+    assert_same(world, expected)
+
+
+def test_processes_match_world_tick():
+    expected = serial(random_world(1, 10 ** 6), 100, 0.7)
+    world = partitioned(random_world(1, 10 ** 6), 100, 0.7, 3, parallel=True)
+    assert_same(world, expected)
+
+
+def test_wide_border_does_not_block_processes():
+    # Тени 1200 клеток границы — около 100 КБ, больше буфера канала
+    def build():
+        return World.from_layout(stress_layout(40, 2400))
+
+    expected = serial(build(), 1, 0.1)
+    world = build()
+    done = threading.Event()
+
+    def run():
+        with PartitionedSimulation(world, regions=2, parallel=True) as sim:
+            sim.step(0.1)
+            sim.sync()
+        done.set()
+
+    threading.Thread(target=run, daemon=True).start()
+    assert done.wait(timeout=120), "симуляция по регионам зависла"
+    assert_same(world, expected)
+
+
+def test_bands_have_at_least_two_rows():
+    world = World.from_layout(stress_layout(9, 4))
+    bands = split_rows(world, 8)
+    assert bands[0][0] == 0 and bands[-1][1] == 9
+    assert all(end - start >= 2 for start, end in bands)
+    assert all(a[1] == b[0] for a, b in zip(bands, bands[1:]))
+
+
+def powered_world() -> World:
+    """Станция, опора и шахта в рядах 0-2: сеть не должна делиться регионами"""
+    world = World(6, 4, economy=Economy(10_000))
+    world.place_many([
+        (0, 0, CoalMine, Direction.RIGHT),
+        (0, 1, PowerPlant, Direction.UP),
+        (1, 1, PowerPole, Direction.RIGHT),
+        (2, 1, Mine, Direction.RIGHT),
+        (2, 2, Conveyor, Direction.UP),
+        (3, 2, Conveyor, Direction.UP),
+        (4, 2, Conveyor, Direction.UP),
+        (5, 2, Market, Direction.UP),
+    ])
+    return world
+
+
+def test_bands_do_not_cut_power_networks():
+    bands = split_rows(powered_world(), 3)
+    assert len(bands) == 2
+    assert all(start not in (1, 2) for start, _ in bands)
+
+
+@pytest.mark.parametrize("parallel", [False, True])
+def test_power_network_across_bands_matches_world_tick(parallel):
+    expected = serial(powered_world(), 200, 0.1)
+    world = partitioned(powered_world(), 200, 0.1, 3, parallel)
+    assert expected.get(2, 1).efficiency == 1.0 + POWER_BOOST
+    assert world.get(2, 1).efficiency == 1.0 + POWER_BOOST
+    assert_same(world, expected)
@@ -0,0 +1,62 @@
+"""Сервер телеметрии: разбор команд, запуск и остановка"""
+import json
+import socket
+import threading
+
+import pytest
+
+from remote import TelemetryServer, parse_command
+
+
+@pytest.mark.parametrize("line", [
+    b'{"cmd": "remove", "row": true, "col": 0}',
+    b'{"cmd": "place", "type": "Mine", "row": 0, "col": false}',
+    b'{"cmd": "speed", "value": true}',
+    b'{"cmd": "remove", "row": 1.5, "col": 0}',
+    b'{"cmd": "explode"}',
+    b'not json',
+    b'{"cmd": []}',
+    b'{"cmd": "place", "type": [], "row": 0, "col": 0}',
+    b'{"cmd": "place", "type": "Mine", "row": 0, "col": 0, "dir": {}}',
+    b'{"cmd": "speed", "value": Infinity}',
+    b'{"cmd": "speed", "value": -Infinity}',
+    b'{"cmd": "speed", "value": NaN}',
+])
+def test_bad_commands_are_rejected(line):
+    with pytest.raises(ValueError):
+        parse_command(line)
+
+
+def test_good_commands_are_parsed():
+    assert parse_command(b'{"cmd": "place", "type": "Mine", "row": 1, "col": 2}')["dir"] == "RIGHT"
+    assert parse_command(b'{"cmd": "speed", "value": 2}')["value"] == 2
+
+
+def test_start_raises_when_port_is_taken():
+    first = TelemetryServer(port=0)
+    first.start()
+    try:
+        second = TelemetryServer(port=first.port)
+        with pytest.raises(OSError):
+            second.start()
+    finally:
+        first.stop()
+
+
+def test_stop_closes_connected_clients():
+    server = TelemetryServer(port=0)
+    server.start()
+    client = socket.create_connection((server.host, server.port), timeout=5)
+    try:
+        client.sendall(b'{"cmd": "pause"}\n')
+        reply = json.loads(client.makefile().readline())
+        assert reply == {"type": "ack", "ok": True}
+        assert server.poll_commands() == [{"cmd": "pause"}]
+
+        stopper = threading.Thread(target=server.stop)
+        stopper.start()
+        stopper.join(timeout=5)
+        assert not stopper.is_alive()
+        assert client.recv(1024) == b""
+    finally:
+        client.close()
@@ -0,0 +1,43 @@
+"""Трассировка учитывает только передачи своего мира"""
+from simulation import World, Economy, Direction, Mine, Conveyor, Market
+from tracing import ItemTracer
+
+
+def factory() -> World:
+    world = World(2, 4, economy=Economy(10_000))
+    world.place_many([
+        (0, 0, Mine, Direction.RIGHT),
+        (0, 1, Conveyor, Direction.RIGHT),
+        (0, 2, Conveyor, Direction.RIGHT),
+        (0, 3, Market, Direction.RIGHT),
+    ])
+    return world
+
+
+def run(world: World, ticks: int = 600):
+    for _ in range(ticks):
+        world.tick(0.1)
+
+
+def test_traces_reach_the_market():
+    world = factory()
+    with ItemTracer(world, every=1) as tracer:
+        run(world)
+    assert tracer.started > 0 and tracer.finished > 0
+    assert list(tracer.routes) == [(Mine, Market)]
+
+
+def test_other_worlds_are_not_traced():
+    world, other = factory(), factory()
+    with ItemTracer(world, every=1) as tracer:
+        run(other)
+    assert tracer.started == 0 and not tracer.tags
+
+
+def test_fork_is_not_traced():
+    world = factory()
+    run(world, 50)
+    twin = world.fork()
+    with ItemTracer(world, every=1) as tracer:
+        run(twin)
+    assert tracer.started == 0 and not tracer.tags
@@ -0,0 +1,172 @@
+"""Изменения сетки: пакетная постройка, история, форки"""
+from simulation import (
+    World, Economy, Direction, Mine, Conveyor, Market, Warehouse, ResourceType,
+)
+
+
+def chain(world: World):
+    """Шахта -> конвейер -> рынок в нижнем ряду"""
+    return world.place_many([
+        (0, 0, Mine, Direction.RIGHT),
+        (0, 1, Conveyor, Direction.RIGHT),
+        (0, 2, Market, Direction.RIGHT),
+    ])
+
+
+# ---------------------------------------
+# ПАКЕТНАЯ ПОСТРОЙКА
+# ---------------------------------------
+def test_place_many_charges_once_and_links_outputs():
+    world = World(3, 4, economy=Economy(1000))
+    mine, conveyor, market = chain(world)
+    assert world.economy.balance == 1000 - (Mine.cost + Conveyor.cost + Market.cost)
+    assert mine.target is conveyor and conveyor.target is market and market.target is None
+
+
+def test_place_many_builds_nothing_without_money():
+    world = World(3, 4, economy=Economy(Mine.cost + Conveyor.cost))
+    assert chain(world) == []
+    assert world.economy.balance == Mine.cost + Conveyor.cost
+    assert not list(world.buildings())
+    assert world.undo_stack == []
+
+
+def test_place_many_skips_occupied_out_of_bounds_and_duplicates():
+    world = World(2, 2, economy=Economy(10_000))
+    world.place(0, 0, Mine, Direction.RIGHT)
+    built = world.place_many([
+        (0, 0, Conveyor, Direction.RIGHT),
+        (5, 5, Conveyor, Direction.RIGHT),
+        (1, 1, Conveyor, Direction.RIGHT),
+        (1, 1, Market, Direction.RIGHT),
+    ])
+    assert [(b.row, b.col, b.__class__) for b in built] == [(1, 1, Conveyor)]
+    assert isinstance(world.grid[0][0], Mine)
+
+
+# ---------------------------------------
+# ИСТОРИЯ
+# ---------------------------------------
+def test_undo_redo_restores_grid_and_money():
+    world = World(3, 4, economy=Economy(5000))
+    chain(world)
+    after_build = world.economy.balance
+
+    assert world.undo()
+    assert not list(world.buildings())
+    assert world.economy.balance == 5000
+
+    assert world.redo()
+    assert [b.__class__ for b in world.buildings()] == [Mine, Conveyor, Market]
+    assert world.economy.balance == after_build
+    assert world.grid[0][0].target is world.grid[0][1]
+
+
+def test_undo_removal_returns_building_with_its_state():
+    world = World(2, 2, economy=Economy(5000))
+    warehouse = world.place(0, 0, Warehouse, Direction.RIGHT)
+    warehouse.accept_item(ResourceType.ORE, (0, -1))
+    refund = world.remove_many([(0, 0)])
+    assert refund == Warehouse.cost // 2
+
+    assert world.undo()
+    assert world.grid[0][0] is warehouse
+    assert warehouse.storage == [ResourceType.ORE]
+    # Отмена сноса забирает возвращённые деньги
+    assert world.economy.balance == 5000 - Warehouse.cost
+
+
+def test_undo_fails_without_money_and_keeps_history():
+    world = World(2, 2, economy=Economy(Mine.cost))
+    world.place(0, 0, Mine, Direction.RIGHT)
+    world.remove_many([(0, 0)])
+    world.economy.balance = 0
+    assert not world.undo()
+    assert world.grid[0][0] is None
+    assert len(world.undo_stack) == 2
+
+
+def test_new_edit_clears_redo():
+    world = World(2, 2, economy=Economy(5000))
+    world.place(0, 0, Mine, Direction.RIGHT)
+    world.undo()
+    world.place(1, 1, Conveyor, Direction.RIGHT)
+    assert not world.redo()
+
+
+def test_clear_is_undoable():
+    world = World(3, 4, economy=Economy(5000))
+    chain(world)
+    balance = world.economy.balance
+    world.clear()
+    assert not list(world.buildings())
+    assert world.undo()
+    assert [b.__class__ for b in world.buildings()] == [Mine, Conveyor, Market]
+    assert world.economy.balance == balance
+
+
+# ---------------------------------------
+# ФОРКИ
+# ---------------------------------------
+def run(world: World, ticks: int, dt: float = 0.5):
+    for _ in range(ticks):
+        world.tick(dt)
+
+
+def test_fork_evolves_independently():
+    world = World(3, 4, economy=Economy(5000))
+    chain(world)
+    balance = world.economy.balance
+    twin = world.fork()
+    run(world, 20)
+
+    assert world.economy.total_sales > 0
+    assert twin.economy.balance == balance
+    assert twin.economy.total_sales == 0
+    assert all(b.timer == 0.0 for b in twin.buildings())
+
+
+def test_fork_edits_do_not_leak():
+    world = World(3, 4, economy=Economy(5000))
+    chain(world)
+    twin = world.fork()
+    twin.remove_many([(0, 1)])
+    world.place(2, 2, Conveyor, Direction.UP)
+
+    assert isinstance(world.grid[0][1], Conveyor)
+    assert twin.grid[0][1] is None
+    assert twin.grid[2][2] is None
+    assert twin.grid[0][0].target is None
+
+
+def test_fork_undo_redo_does_not_share_buildings():
+    world = World(4, 4)
+    world.place(0, 0, Mine, Direction.RIGHT)
+    twin = world.fork()
+    world.tick(0.1)
+    world.undo()
+    world.redo()
+    assert world.grid[0][0] is not twin.grid[0][0]
+
+    world.tick(3.0)
+    mine = twin.grid[0][0]
+    assert mine.item is None and mine.timer == 0.0
+    assert world.grid[0][0].item is ResourceType.ORE
+
+
+def test_fork_matches_a_world_built_the_same_way():
+    def build():
+        world = World(3, 4, economy=Economy(5000))
+        chain(world)
+        return world
+
+    original = build()
+    run(original, 5)
+    twin = original.fork()
+    reference = build()
+    run(reference, 5)
+
+    run(twin, 30)
+    run(reference, 30)
+    assert twin.economy.balance == reference.economy.balance
+    assert [(b.item, b.timer) for b in twin.buildings()] == [(b.item, b.timer) for b in reference.buildings()]
@@ -0,0 +1,313 @@
+"""Выборочная трассировка предметов: сколько едет руда от шахты до рынка.
+
+Предметы в симуляции — голые ResourceType без идентичности, поэтому метка
+трассы живёт не в предмете, а в здании, которое его держит: когда здание
+принимает предмет (accept_item), метка переходит к нему от источника.
+Каждый N-й предмет, покидающий производящее здание, получает метку
+(номер трассы); трасса заканчивается на рынке.
+
+По пути записывается, сколько времени предмет провёл в зданиях каждого
+типа, а в конце — полная задержка в гистограмму маршрута. Маршрут — это
+цепочка «станций» без конвейеров, например Mine > Smelter > Market.
+Память ограничена: гистограммы фиксированного размера, число маршрутов
+и одновременно живых трасс ограничено.
+
+Трассировщик подменяет accept_item у классов зданий только пока включён;
+выключенный он ничего не стоит конвейерам. Подмена действует на все миры
+процесса, поэтому передачи в чужих мирах (форки, прогоны оптимизатора)
+отбрасываются: учитывается только здание, которое стоит в своей клетке
+трассируемого мира.
+
+    with ItemTracer(world, every=100) as tracer:
+        for _ in range(10000):
+            world.tick(0.1)
+    print(tracer.report())
+
+    python tracing.py factory.txt --ticks 10000 --every 50
+"""
+import argparse
+import sys
+from typing import Dict, List, Optional, Tuple
+
+from simulation import World, BUILDING_REGISTRY, Conveyor, Warehouse, Market
+
+# Гистограммы: корзина i — задержки от 2^(i-1) до 2^i шагов по 1/16 с
+HISTOGRAM_RESOLUTION = 16
+HISTOGRAM_BUCKETS = 24
+
+MAX_ROUTES = 64
+MAX_IN_FLIGHT = 4096
+# Трассы, которые едут дольше (предмет застрял или здание снесли), выбрасываются
+MAX_TRACE_AGE = 3600.0
+
+# Все маршруты сверх MAX_ROUTES складываются сюда
+OTHER_ROUTE: Tuple[type, ...] = ()
+
+_active: Optional["ItemTracer"] = None
+
+
+class LatencyHistogram:
+    """Логарифмическая гистограмма задержек фиксированного размера"""
+
+    __slots__ = ("buckets", "count", "total", "max")
+
+    def __init__(self):
+        self.buckets = [0] * HISTOGRAM_BUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds: float):
+        bucket = int(seconds * HISTOGRAM_RESOLUTION).bit_length()
+        self.buckets[min(bucket, HISTOGRAM_BUCKETS - 1)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    @staticmethod
+    def upper_bound(bucket: int) -> float:
+        return (1 << bucket) / HISTOGRAM_RESOLUTION
+
+    def percentile(self, q: float) -> float:
+        """Верхняя граница корзины, в которую попадает q-я доля задержек"""
+        rank = q * self.count
+        seen = 0
+        for bucket, n in enumerate(self.buckets):
+            seen += n
+            if n and seen >= rank:
+                return min(self.upper_bound(bucket), self.max)
+        return self.max
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+
+class RouteStats:
+    """Задержки одного маршрута и время ожидания по типам зданий"""
+
+    __slots__ = ("latency", "waits")
+
+    def __init__(self):
+        self.latency = LatencyHistogram()
+        self.waits: Dict[type, float] = {}
+
+
+class _Trace:
+    __slots__ = ("id", "start", "route", "kind", "since", "waits")
+
+    def __init__(self, trace_id: int, start: float, origin: type):
+        self.id = trace_id
+        self.start = start
+        self.route = [origin]
+        # Сколько предмет ждал в производящем здании, не известно: отсчёт
+        # начинается с выхода из него
+        self.kind: Optional[type] = None
+        self.since = start
+        self.waits: Dict[type, float] = {}
+
+    def hop(self, kind: type, now: float):
+        """Предмет перешёл в здание kind: закрываем ожидание в предыдущем"""
+        if self.kind is not None:
+            self.waits[self.kind] = self.waits.get(self.kind, 0.0) + (now - self.since)
+        self.kind = kind
+        self.since = now
+        if kind is not Conveyor and kind is not self.route[-1]:
+            self.route.append(kind)
+
+
+class ItemTracer:
+    """Трассирует каждый every-й предмет, выходящий из производящего здания.
+
+    Мир тикается как обычно; трассировщик нужно включать и выключать между
+    тиками (enable/disable или with). Одновременно активен только один.
+    """
+
+    def __init__(self, world: World, every: int = 100):
+        if every < 1:
+            raise ValueError("every должно быть не меньше 1")
+        self.world = world
+        self.every = every
+        self._countdown = every
+        self._next_id = 0
+
+        # Метки трасс у зданий, которые сейчас держат трассируемые предметы
+        self.tags: Dict[object, List[_Trace]] = {}
+        self.in_flight = 0
+
+        self.routes: Dict[Tuple[type, ...], RouteStats] = {}
+        self.dwell: Dict[type, LatencyHistogram] = {}
+        self.started = 0
+        self.finished = 0
+        self.merged = 0
+        self.dropped = 0
+
+        self._originals: Dict[type, Optional[object]] = {}
+
+    # ---------------------------------------
+    # ВКЛЮЧЕНИЕ
+    # ---------------------------------------
+    def enable(self):
+        global _active
+        if _active is self:
+            return
+        if _active is not None:
+            raise RuntimeError("другой трассировщик уже включён")
+        for cls in BUILDING_REGISTRY:
+            self._originals[cls] = cls.__dict__.get("accept_item")
+            cls.accept_item = self._wrap(cls.accept_item)
+        _active = self
+
+    def disable(self):
+        global _active
+        if _active is not self:
+            return
+        for cls, original in self._originals.items():
+            if original is None:
+                del cls.accept_item
+            else:
+                cls.accept_item = original
+        self._originals = {}
+        _active = None
+
+    def __enter__(self):
+        self.enable()
+        return self
+
+    def __exit__(self, *exc):
+        self.disable()
+
+    def _wrap(self, accept_item):
+        on_accept = self._on_accept
+
+        def traced_accept_item(building, item_type, from_coords):
+            if accept_item(building, item_type, from_coords):
+                on_accept(building, from_coords)
+                return True
+            return False
+
+        return traced_accept_item
+
+    # ---------------------------------------
+    # ПЕРЕДАЧА ПРЕДМЕТА
+    # ---------------------------------------
+    def _on_accept(self, building, from_coords: Tuple[int, int]):
+        world = self.world
+        # Передача в другом мире: здание не стоит в своей клетке нашего
+        if world.get(building.row, building.col) is not building:
+            return
+        source = world.get(*from_coords)
+        if source is None:
+            return
+        now = world.time
+        tags = self.tags
+
+        pending = tags.get(source)
+        if pending:
+            if source.__class__ is Warehouse:
+                # Склад отдаёт предметы по очереди, метки идут в том же порядке
+                trace = pending.pop(0)
+            else:
+                # Завод превращает входы в один выход: продолжаем самую старую трассу
+                trace = pending[0]
+                self.merged += len(pending) - 1
+                self.in_flight -= len(pending) - 1
+                pending.clear()
+            if not pending:
+                del tags[source]
+        else:
+            if source.__class__ is Conveyor or source.__class__ is Warehouse:
+                return
+            self._countdown -= 1
+            if self._countdown:
+                return
+            self._countdown = self.every
+            trace = self._start(source.__class__, now)
+            if trace is None:
+                return
+
+        trace.hop(building.__class__, now)
+        if building.__class__ is Market:
+            self._finish(trace, now)
+        else:
+            tags.setdefault(building, []).append(trace)
+
+    def _start(self, origin: type, now: float) -> Optional[_Trace]:
+        if self.in_flight >= MAX_IN_FLIGHT:
+            self._expire(now)
+            if self.in_flight >= MAX_IN_FLIGHT:
+                self.dropped += 1
+                return None
+        self._next_id += 1
+        self.started += 1
+        self.in_flight += 1
+        return _Trace(self._next_id, now, origin)
+
+    def _finish(self, trace: _Trace, now: float):
+        self.finished += 1
+        self.in_flight -= 1
+
+        route = tuple(trace.route)
+        stats = self.routes.get(route)
+        if stats is None:
+            if len(self.routes) >= MAX_ROUTES:
+                route = OTHER_ROUTE
+            stats = self.routes.setdefault(route, RouteStats())
+        stats.latency.add(now - trace.start)
+
+        for kind, seconds in trace.waits.items():
+            stats.waits[kind] = stats.waits.get(kind, 0.0) + seconds
+            dwell = self.dwell.get(kind)
+            if dwell is None:
+                dwell = self.dwell[kind] = LatencyHistogram()
+            dwell.add(seconds)
+
+    def _expire(self, now: float):
+        """Выбрасываем трассы, застрявшие дольше MAX_TRACE_AGE"""
+        for holder in list(self.tags):
+            pending = self.tags[holder]
+            alive = [trace for trace in pending if now - trace.start <= MAX_TRACE_AGE]
+            self.dropped += len(pending) - len(alive)
+            self.in_flight -= len(pending) - len(alive)
+            if alive:
+                self.tags[holder] = alive
+            else:
+                del self.tags[holder]
+
+    # ---------------------------------------
+    # ОТЧЁТ
+    # ---------------------------------------
+    def report(self) -> str:
+        lines = [f"трасс: начато {self.started}, дошло до рынка {self.finished}, "
+                 f"в пути {self.in_flight}, слито {self.merged}, выброшено {self.dropped}"]
+        for route, stats in sorted(self.routes.items(), key=lambda kv: -kv[1].latency.count):
+            latency = stats.latency
+            name = " > ".join(kind.__name__ for kind in route) if route else "прочие маршруты"
+            lines.append(f"{name}: {latency.count} шт., среднее {latency.mean:.1f} с, "
+                         f"p50 ≤ {latency.percentile(0.5):.1f} с, p90 ≤ {latency.percentile(0.9):.1f} с, "
+                         f"макс {latency.max:.1f} с")
+            waits = sorted(stats.waits.items(), key=lambda kv: -kv[1])
+            lines.append("    ожидание: " + ", ".join(
+                f"{kind.__name__} {seconds / latency.count:.1f} с" for kind, seconds in waits))
+        return "\n".join(lines)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Задержки предметов от производства до рынка")
+    parser.add_argument("layout", help="файл раскладки (.txt или .jsonl)")
+    parser.add_argument("--ticks", type=int, default=10000)
+    parser.add_argument("--dt", type=float, default=0.1, help="шаг тика, с")
+    parser.add_argument("--every", type=int, default=100, help="трассировать каждый N-й предмет")
+    args = parser.parse_args()
+
+    world = World.from_layout(args.layout)
+    with ItemTracer(world, args.every) as tracer:
+        for _ in range(args.ticks):
+            world.tick(args.dt)
+    print(tracer.report())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())